@@ -171,10 +171,12 @@ def codegen(self, program, args, *, fn_name: str = "main", fn_defs=dict()) -> Li
     backend: Dict[slope.Var, Any] = {}
     il1 = (self.depth + 1) * 4
     body_code_lines = []
+    counts = dict(x=0, c=0, y=0, z=0)
 
     for inb in program.in_binders:
         prefix = "x" if type(inb.symtensor) is SymbolicTensor else "c"
-        idx = sum_py([1 if v["name"][0] == prefix else 0 for v in backend.values()])
+        idx = counts[prefix]
+        counts[prefix] += 1
         backend[inb] = dict(name=f"{prefix}{idx}", type=inb.symtensor)
 
     for instruction in program.instructions:
@@ -183,7 +185,8 @@ def codegen(self, program, args, *, fn_name: str = "main", fn_defs=dict()) -> Li
         in_vals = list_map(lambda x: backend[x]["name"], instruction.inputs)
         for outb in instruction.out_binders:
             prefix = "y" if outb in program.outs else "z"
-            idx = sum_py([1 if v["name"][0] == prefix else 0 for v in backend.values()])
+            idx = counts[prefix]
+            counts[prefix] += 1
             backend[outb] = dict(name=f"{prefix}{idx}", type=outb.symtensor)
 
         out_vals = list_map(lambda z: backend[z]["name"], instruction.out_binders)
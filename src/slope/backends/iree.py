@@ -25,9 +25,11 @@ from typing import (
     List,
     Any,
 )
-import iree.compiler
 import iree.runtime
 import os
+import platform
+import hashlib
+from functools import lru_cache
 
 from slope.operators import operator_set
 from slope.procedures import procedure_set
@@ -37,13 +39,40 @@ from pygments.lexers.jvm import JavaLexer
 from pygments.formatters import Terminal256Formatter
 
 
+_iree_compiler = None
+
+
+def _get_iree_compiler():
+    # iree.compiler is only needed once a program is jitted or exported, so import it on first use
+    global _iree_compiler
+    if _iree_compiler is None:
+        import iree.compiler as _iree_compiler
+        import iree.compiler.version
+    return _iree_compiler
+
+
+@lru_cache(maxsize=None)
+def host_cpu():
+    # what --iree-llvmcpu-target-cpu*=host resolve to, None if it can't be read
+    try:
+        with open("/proc/cpuinfo") as f:
+            lines = f.read().split("\n\n")[0].splitlines()
+    except OSError:
+        return None
+    fields = ("vendor_id", "cpu family", "model", "model name", "flags", "CPU implementer", "CPU architecture", "CPU variant", "CPU part", "Features")
+    info = [line for line in lines if line.split(":")[0].strip() in fields]
+    return "\n".join([platform.machine(), *info]) if info else None
+
+
 def annotate_shape(symval):
-    xdtype = symval.dtype.mlir
-    if len(symval.shape) > 0:
-        xshape = f"{'x'.join((repr(i) for i in symval.shape))}"
-        return f"tensor<{xshape}x{xdtype}>"
-    else:
-        return f"tensor<{xdtype}>"
+    return tensor_type(symval.shape, symval.dtype)
+
+
+@lru_cache(maxsize=4096)
+def tensor_type(shape, dtype):
+    if len(shape) > 0:
+        return f"tensor<{'x'.join(map(str, shape))}x{dtype.mlir}>"
+    return f"tensor<{dtype.mlir}>"
 
 
 def annotate_sig(in_symvals, out_symvals):
@@ -59,6 +88,13 @@ def annotate_sig(in_symvals, out_symvals):
 
 class IREEBackend(Backend):
     dtype_for_indices = dtypes.int32
+    # compiled .vmfb modules persist here across processes; set SLOPE_IREE_CACHE="" to disable
+    cache_dir = os.environ.get(
+        "SLOPE_IREE_CACHE", os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "slope", "iree")
+    )
+    # cpu programs whose inputs and outputs are all at most this many elements run on the local-sync driver,
+    # skipping the task-system scheduler; set SLOPE_IREE_SYNC_NUMEL=0 to always use local-task
+    sync_numel = int(os.environ.get("SLOPE_IREE_SYNC_NUMEL", 1 << 16))
     dtype_map = {
         dtypes.float32: np.dtypes.Float32DType(),
         dtypes.uint8: np.dtypes.UInt8DType(),
@@ -82,14 +118,26 @@ class IREEBackend(Backend):
     }
 
     dtype_map_inv = {v: k for k, v in dtype_map.items()}
-    device_map_inv = {v: k for k, v in device_map.items()}
+    device_map_inv = {v: k for k, v in device_map.items()} | {"local-sync": devices.cpu}
+
+    @lru_cache(maxsize=None)
+    def iree_device(self, device, sync=False):
+        return iree.runtime.get_device("local-sync" if sync and device is devices.cpu else self.device_map[device])
+
+    @lru_cache(maxsize=None)
+    def vm_instance(self):
+        return iree.runtime.VmInstance()
+
+    @lru_cache(maxsize=None)
+    def hal_module(self, device, sync=False):
+        return iree.runtime.create_hal_module(self.vm_instance(), self.iree_device(device, sync))
 
     def from_numpy(self, val, dtype=None, device=None):
         dtype = dtype or self.DEFAULT_DTYPE
         device = device or self.DEFAULT_DEVICE
-        np_val = np.array(val, dtype=dtype.numpy)
-        iree_device = iree.runtime.get_device(self.device_map[device])
-        val = iree.runtime.asdevicearray(iree_device, np_val)
+        # asdevicearray copies into its own buffer, so a matching C-contiguous array is passed as is
+        np_val = np.asarray(val, dtype=dtype.numpy, order="C")
+        val = iree.runtime.asdevicearray(self.iree_device(device), np_val)
         return Tensor(TensorBuffer(val))
 
     def numpy_of(self, tensor: Tensor, memmap=False):
@@ -114,10 +162,7 @@ class IREEBackend(Backend):
             assert not hasattr(self, "fn_count")
             self.fn_count = 0
 
-        def indent(code):
-            spaces = " " * (len(code) - len(code.lstrip()))
-            spaces += " " * 4
-            return "\n".join([spaces + line for line in code.strip().split("\n")])
+        indent = " " * 4  # impls emit left-aligned lines, relative indentation inside them is kept
 
         # codegen is recursive if jit-of-jit happens
         body_code_lines = []
@@ -136,8 +181,10 @@ class IREEBackend(Backend):
                     # No impl is defined, fallback to procedure
                     impl_code, fn_defs = self.codegen_impl_as_procedure(args, instruction, fn_defs, in_vals, out_vals)
 
-            for impl_code_line in impl_code.split("\n"):  # handle multi-line code
-                body_code_lines += [indent(impl_code_line)]
+            if "\n" in impl_code:
+                body_code_lines += [indent + line for line in impl_code.split("\n") if line.strip()]
+            else:
+                body_code_lines.append(indent + impl_code)
 
         in_binders = list_map(lambda x: program.env[x], program.in_binders)
         fn_args_str = ", ".join([f"%{i.name}: {annotate_shape(i.symval)}" for i in in_binders])
@@ -147,7 +194,7 @@ class IREEBackend(Backend):
         out_type_str = ", ".join([f"{annotate_shape(o.symval)}" for o in outs])
 
         head_code_line = [f"func.func @{fn_name} ({fn_args_str}) -> ({out_type_str})"]
-        tail_code_line = [indent(f'"func.return"({out_str}): ({out_type_str}) -> ()')]
+        tail_code_line = [f'{indent}"func.return"({out_str}): ({out_type_str}) -> ()']
         model_code_lines = head_code_line + ["{"] + body_code_lines + tail_code_line + ["}"]
 
         code_lines = model_code_lines
@@ -177,16 +224,15 @@ class IREEBackend(Backend):
         op_procedure = getattr(self.procedure_set, op_name)
         symvals_in = tuple(inp.symval for inp in instruction.inputs)
         params = instruction.params
-        op_program, consts, _ = slope.core.make_program(
-            op_procedure,
-            *symvals_in,
-            static_args=tuple(params.items()),
-            name=op.name,
-        )
-        name = slope.core.jit.get_jit_name(tuple(symvals_in), params)
-        if name not in fn_defs.keys():
-            # if name == "jit_shape__lp_50_cm_3_cm_32_cm_32_rp__dtype_float32_shape__lp_16_cm_3_cm_3_cm_3_rp__dtype_float32_groups_1_stride__lp_1_cm_1_rp__dilation__lp_1_cm_1_rp__padding__lp_1_cm_1_cm_1_cm_1_rp__":
-            #     breakpoint()
+        # named per op as well, so procedures with the same signature and params do not share a definition
+        name = slope.core.jit.get_jit_name(tuple(symvals_in), params, op.name)
+        if name not in fn_defs.keys():  # traced and emitted once per codegen
+            op_program, consts, _ = slope.core.make_program(
+                op_procedure,
+                *symvals_in,
+                static_args=tuple(params.items()),
+                name=op.name,
+            )
             op_codegen_output: CodegenOutput = self.codegen(
                 op_program,
                 args,
@@ -204,21 +250,32 @@ class IREEBackend(Backend):
     def compile(self, codegen_output):
         code_lines = codegen_output.code_lines
         code = "\n".join(code_lines)
-        instance = iree.runtime.VmInstance()
+        instance = self.vm_instance()
         device = codegen_output.outs[0].device
-        iree_device = iree.runtime.get_device(self.device_map[device])
-        hal_module = iree.runtime.create_hal_module(instance, iree_device)
-        binary = iree.compiler.compile_str(
+        symvals = [i.symval for i in codegen_output.in_binders] + list(codegen_output.outs)
+        sync = max(math.prod(s.shape) for s in symvals) <= self.sync_numel
+        iree_device = self.iree_device(device, sync)
+        hal_module = self.hal_module(device, sync)
+        target_backend = self.target_map[device]
+        binary = self.compile_cached(
             code,
-            target_backends=(self.target_map[device],),
-            optimize=True,
-            extra_args=[
+            target_backend,
+            (
                 "--iree-vm-bytecode-module-optimize",
+                *(
+                    (
+                        "--iree-llvmcpu-target-cpu=host",
+                        "--iree-llvmcpu-target-cpu-features=host",
+                        "--iree-flow-enable-fuse-padding-into-linalg-consumer-ops",
+                    )
+                    if target_backend == "llvm-cpu"
+                    else ()
+                ),
                 # "--iree-opt-const-eval",
                 # "--iree-opt-const-expr-hoisting",
-                # "--iree-opt-data-tiling",
+                # "--iree-opt-data-tiling",  # fails on matmul operands cast from i1 ('tensor.pack' padding_value)
                 # "--iree-opt-numeric-precision-reduction"
-            ],
+            ),
         )
         m = iree.runtime.VmModule.from_flatbuffer(instance, binary)
         context = iree.runtime.VmContext(instance, modules=[hal_module, m])
@@ -228,6 +285,31 @@ class IREEBackend(Backend):
 
         return finv, code
 
+    @lru_cache(maxsize=256)  # the last .vmfb binaries of this process, by code and flags
+    def compile_cached(self, code, target_backend, extra_args):
+        # a binary tuned for the host cpu can crash elsewhere with SIGILL, the cache_dir may be shared by
+        # machines, so the cpu goes into the key, and if it is unknown the binary is not written to disk
+        cpu = host_cpu() if any(a.endswith("=host") for a in extra_args) else ""
+        key = "\n".join([_get_iree_compiler().version.VERSION, target_backend, *extra_args, cpu or "", code])
+        key = hashlib.sha256(key.encode()).hexdigest()
+        path = os.path.join(self.cache_dir, f"{key}.vmfb") if self.cache_dir and cpu is not None else None
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        binary = _get_iree_compiler().compile_str(code, target_backends=(target_backend,), optimize=True, extra_args=list(extra_args))
+        if path is not None:
+            # a read-only or full cache_dir only loses the disk cache, the binary is still cached in this process
+            f = None
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+                    f.write(binary)
+                os.replace(f.name, path)  # atomic, concurrent writers of the same key are harmless
+            except OSError:
+                if f is not None and os.path.exists(f.name):
+                    os.remove(f.name)
+        return binary
+
     def export(self, jit_output, output_path, export_params, input_names, output_names, **kwargs):
         # iree.compiler.core.DEFAULT_TESTING_BACKENDS
         target_backends = kwargs.get("target_backends", "llvm-cpu")
@@ -253,7 +335,7 @@ class IREEBackend(Backend):
                 )
             f.writelines("\n".join(code_lines[2:]))
             f.flush()
-            iree.compiler.compile_file(f.name, target_backends=target_backends, output_file=os.path.join(output_path, "model.vmfb"))
+            _get_iree_compiler().compile_file(f.name, target_backends=target_backends, output_file=os.path.join(output_path, "model.vmfb"))
 
         input_arg_names = [ib.name for ib in in_binders[num_consts:]]
         input_arg_names_str = ", ".join(input_arg_names)
@@ -317,11 +399,6 @@ def jit_op_impl(self, args, instruction, fn_defs, in_vals, out_vals):
             fn_name=jit_name,
             fn_defs=fn_defs,
         )
-        if (
-            jit_name
-            == "@jit_shape__lp_50_cm_3_cm_32_cm_32_rp__dtype_float32_shape__lp_16_cm_3_cm_3_cm_3_rp__dtype_float32_groups_1_stride__lp_1_cm_1_rp__dilation__lp_1_cm_1_rp__padding__lp_1_cm_1_cm_1_cm_1_rp__@jit_shape__lp_50_cm_3_cm_32_cm_32_rp__dtype_float32_shape__lp_16_cm_3_cm_3_cm_3_rp__dtype_float32_groups_1_stride__lp_1_cm_1_rp__dilation__lp_1_cm_1_rp__padding__lp_1_cm_1_cm_1_cm_1_rp__"
-        ):
-            breakpoint()
         fn_defs = {**fn_defs, **jit_codegen_output.fn_defs}
         fn_defs[jit_name] = jit_codegen_output.code_lines
 
@@ -346,6 +423,11 @@ def sqrt_impl(self, x, y):
     return f'%{y.name} = "stablehlo.sqrt"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
 
 
+@backend.set_impl(backend.operator_set.rsqrt)
+def rsqrt_impl(self, x, y):
+    return f'%{y.name} = "stablehlo.rsqrt"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
+
+
 @backend.set_impl(backend.operator_set.exp)
 def exp_impl(self, x, y):
     return f'%{y.name} = "stablehlo.exponential"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
@@ -361,6 +443,21 @@ def sin_impl(self, x, y):
     return f'%{y.name} = "stablehlo.sine"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
 
 
+@backend.set_impl(backend.operator_set.cos)
+def cos_impl(self, x, y):
+    return f'%{y.name} = "stablehlo.cosine"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
+
+
+@backend.set_impl(backend.operator_set.abs)
+def abs_impl(self, x, y):
+    return f'%{y.name} = "stablehlo.abs"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
+
+
+@backend.set_impl(backend.operator_set.sign)
+def sign_impl(self, x, y):
+    return f'%{y.name} = "stablehlo.sign"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
+
+
 @backend.set_impl(backend.operator_set.invert)
 def invert_impl(self, x, y):
     return f'%{y.name} = "stablehlo.not"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
@@ -445,6 +542,26 @@ def matmul_impl(self, x, w, y):
 """
 
 
+@backend.set_impl(backend.operator_set.cumsum)
+def cumsum_impl(self, x, y, *, dim):
+    # a window spanning the whole dim, padded in front, sums each prefix without materializing windows
+    zero = "0." if dtypes.is_float(y.symval.dtype) else "0"
+    y_init_type = SymbolicTensor((), y.symval.dtype, y.symval.device)
+    y_mlir_type = annotate_shape(y_init_type)
+    n, r = x.symval.shape[dim], x.symval.ndim
+    window = [n if d == dim else 1 for d in range(r)]
+    padding = [[n - 1, 0] if d == dim else [0, 0] for d in range(r)]
+    return f"""%{y.name}_init = stablehlo.constant dense<{zero}> : {y_mlir_type}
+%{y.name} = "stablehlo.reduce_window"(%{x.name}, %{y.name}_init) ({{
+  ^bb0(%arg0: {y_mlir_type}, %arg1: {y_mlir_type}):
+    %0 = "stablehlo.add"(%arg0, %arg1) : {annotate_sig((y_init_type, y_init_type), y_init_type)}
+    "stablehlo.return"(%0) : ({y_mlir_type}) -> ()
+}}) {{
+  window_dimensions = dense<{window}> : tensor<{r}xi64>,
+  padding = dense<{padding}> : tensor<{r}x2xi64>
+}} : {annotate_sig((x.symval, y_init_type), y.symval)}"""
+
+
 @backend.set_impl(backend.operator_set.sum)
 def sum_impl(self, x, y, *, dim, keepdim):
     zero = "0." if dtypes.is_float(y.symval.dtype) else "0"
@@ -473,10 +590,15 @@ def sum_impl(self, x, y, *, dim, keepdim):
 
 @backend.set_impl(backend.operator_set.max)
 def max_impl(self, x, y, *, dim, keepdim):
+    # reduction identity: -inf for floats (as raw bits), the lowest value for ints;
+    # the body is compare+select (maxnum-like) rather than stablehlo.maximum, whose
+    # IEEE maximumf lowering miscompiled innermost-dim reductions of negative inputs
     min_val = {
-        dtypes.float32: "1.E-38",
+        dtypes.float32: "0xFF800000",
+        dtypes.float16: "0xFC00",
         dtypes.int8: "-128",
-        dtypes.int32: "-65536",
+        dtypes.int32: "-2147483648",
+        dtypes.int64: "-9223372036854775808",
     }[x.symval.dtype]
     y_init_type = SymbolicTensor((), y.symval.dtype, y.symval.device)
     y_mlir_type = annotate_shape(y_init_type)
@@ -493,7 +615,8 @@ def max_impl(self, x, y, *, dim, keepdim):
 %{y.name}_init = stablehlo.constant dense<{min_val}> : {annotate_shape(y_init_type)}
 %{y.name}{'_' if keepdim else ''} = "stablehlo.reduce"(%{x.name}, %{y.name}_init) ({{
   ^bb0(%arg0: {y_mlir_type}, %arg1: {y_mlir_type}):
-    %0 = "stablehlo.maximum"(%arg0, %arg1) : {annotate_sig((y_init_type, y_init_type), y_init_type)}
+    %gt = "stablehlo.compare"(%arg0, %arg1) {{comparison_direction = #stablehlo<comparison_direction GT>}} : {annotate_sig((y_init_type, y_init_type), y_init_type.like(dtype=dtypes.bool))}
+    %0 = "stablehlo.select"(%gt, %arg0, %arg1) : {annotate_sig((y_init_type.like(dtype=dtypes.bool), y_init_type, y_init_type), y_init_type)}
     "stablehlo.return"(%0) : ({y_mlir_type}) -> ()
 }}) {{
   dimensions = dense<{repr(list(dim))}> : tensor<{len(dim)}xi64>
@@ -502,31 +625,66 @@ def max_impl(self, x, y, *, dim, keepdim):
 """
 
 
+@backend.set_impl(backend.operator_set.argmax)
+def argmax_impl(self, x, y, *, dim, keepdim):
+    # variadic reduce over (value, index) pairs, keeping the larger value or the lower index of equal ones
+    (d,) = dim
+    x_dtype = x.symval.dtype
+    v_type = SymbolicTensor((), x_dtype, x.symval.device)
+    i_type = SymbolicTensor((), y.symval.dtype, y.symval.device)
+    b_type = SymbolicTensor((), dtypes.bool, y.symval.device)
+    v_init = mlir_literal(float("-inf") if dtypes.is_float(x_dtype) else np.iinfo(x_dtype.numpy).min, x_dtype)
+    out_shape = tuple(n for i, n in enumerate(x.symval.shape) if i != d)
+    v_out_type = SymbolicTensor(out_shape, x_dtype, x.symval.device)
+    i_out_type = SymbolicTensor(out_shape, y.symval.dtype, y.symval.device)
+    cmp = lambda direction, a, b, t: (
+        f'"stablehlo.compare"({a}, {b}) {{comparison_direction = #stablehlo<comparison_direction {direction}>}} : '
+        f"{annotate_sig((t, t), b_type)}"
+    )
+    return f"""%{y.name}_iota = "stablehlo.iota"() {{iota_dimension = {d} : i64}} : {annotate_sig((), x.symval.like(dtype=y.symval.dtype))}
+%{y.name}_vinit = stablehlo.constant dense<{v_init}> : {annotate_shape(v_type)}
+%{y.name}_iinit = stablehlo.constant dense<0> : {annotate_shape(i_type)}
+%{y.name}_v, %{y.name}{'_' if keepdim else ''} = "stablehlo.reduce"(%{x.name}, %{y.name}_iota, %{y.name}_vinit, %{y.name}_iinit) ({{
+  ^bb0(%av: {annotate_shape(v_type)}, %ai: {annotate_shape(i_type)}, %bv: {annotate_shape(v_type)}, %bi: {annotate_shape(i_type)}):
+    %gt = {cmp("GT", "%av", "%bv", v_type)}
+    %eq = {cmp("EQ", "%av", "%bv", v_type)}
+    %lt = {cmp("LT", "%ai", "%bi", i_type)}
+    %tie = "stablehlo.and"(%eq, %lt) : {annotate_sig((b_type, b_type), b_type)}
+    %pick = "stablehlo.or"(%gt, %tie) : {annotate_sig((b_type, b_type), b_type)}
+    %v = "stablehlo.select"(%pick, %av, %bv) : {annotate_sig((b_type, v_type, v_type), v_type)}
+    %i = "stablehlo.select"(%pick, %ai, %bi) : {annotate_sig((b_type, i_type, i_type), i_type)}
+    "stablehlo.return"(%v, %i) : ({annotate_shape(v_type)}, {annotate_shape(i_type)}) -> ()
+}}) {{
+  dimensions = dense<[{d}]> : tensor<1xi64>
+}} : {annotate_sig((x.symval, x.symval.like(dtype=y.symval.dtype), v_type, i_type), (v_out_type, i_out_type))}
+{f'%{y.name} = "stablehlo.reshape"(%{y.name}_) : {annotate_sig((i_out_type,), y.symval)}' if keepdim else ''}"""
+
+
+def mlir_literal(value, dtype):
+    if "f" in dtype.mlir and not math.isfinite(value):  # inf and nan are only written as raw bits
+        return f"0x{np.array(value, dtype=dtype.numpy).view(f'u{dtype.itemsize}').item():X}"
+    value = repr(float(value) if "f" in dtype.mlir else int(value))
+    return value.replace("e", "E") if "." in value else value.replace("e", ".E")
+
+
 @backend.set_impl(backend.operator_set.arange)
 def arange_impl(self, y, *, start, stop, stride, dtype, device):
-    if stride == 1 and start == 0:
-        return f"""%{y.name} = "stablehlo.iota"() {{iota_dimension = 0 : i64}} : {annotate_sig((), y.symval)}"""
-    one_symval = y.symval.like(shape=(1,))
-    return f"""
-%{y.name}_scale_ = stablehlo.constant dense<{stride}> : {annotate_shape(one_symval)}
-%{y.name}_scale = "stablehlo.broadcast_in_dim"(%{y.name}_scale_) {{
-        broadcast_dimensions = dense<{repr(list(range(y.symval.ndim)))}>: tensor<{y.symval.ndim}xi64>
-        }} : {annotate_sig(( one_symval,), y.symval)}
-%{y.name}_shift_ = stablehlo.constant dense<{start}> : {annotate_shape(y.symval.like(shape=(1,)))}
-%{y.name}_shift = "stablehlo.broadcast_in_dim"(%{y.name}_shift_) {{
-        broadcast_dimensions = dense<{repr(list(range(y.symval.ndim)))}>: tensor<{y.symval.ndim}xi64>
-        }} : {annotate_sig(( one_symval,), y.symval)}
-%{y.name}__ = "stablehlo.iota"() {{iota_dimension = 0 : i64}} : {annotate_sig((), y.symval)}
-%{y.name}_ = "stablehlo.multiply"(%{y.name}__, %{y.name}_scale) : {annotate_sig((y.symval, y.symval), y.symval)}
-%{y.name} = "stablehlo.add"(%{y.name}_, %{y.name}_shift) : {annotate_sig((y.symval, y.symval), y.symval)}
-"""
+    # iota, scaled and shifted by splat constants, all generated on device
+    sig = annotate_sig((y.symval, y.symval), y.symval)
+    steps = [("multiply", stride, 1), ("add", start, 0)]
+    steps = [(op, c) for op, c, identity in steps if c != identity]
+    code = f'%{y.name}{"_0" if steps else ""} = "stablehlo.iota"() {{iota_dimension = 0 : i64}} : {annotate_sig((), y.symval)}'
+    for i, (op, c) in enumerate(steps, 1):
+        out = f"{y.name}_{i}" if i < len(steps) else y.name
+        code += f"""
+%{y.name}_c{i} = stablehlo.constant dense<{mlir_literal(c, dtype)}> : {annotate_shape(y.symval)}
+%{out} = "stablehlo.{op}"(%{y.name}_{i - 1}, %{y.name}_c{i}) : {sig}"""
+    return code
 
 
 @backend.set_impl(backend.operator_set.full)
 def full_impl(self, y, *, shape, fill_value, dtype, device):
-    fill_value = float(fill_value) if "f" in dtype.mlir else int(fill_value)
-    fill_value = repr(fill_value)
-    fill_value = fill_value.replace("e", "E") if "." in fill_value else fill_value.replace("e", ".E")
+    fill_value = mlir_literal(fill_value, dtype)
     return (
         f'%{y.name} = "stablehlo.constant"() {{ value = dense<{fill_value}> : {annotate_shape(y.symval)} }} : {annotate_sig((), y.symval)}'
     )
@@ -587,12 +745,26 @@ def reshape_impl(self, x, y, *, shape):
     return f'%{y.name} = "stablehlo.reshape"(%{x.name}) : {annotate_sig((x.symval,), y.symval)}'
 
 
+@backend.set_view_impl(backend.operator_set.reshape)
+def reshape_view_impl(self, x, *, shape):
+    # device buffers are dense, so an eager reshape is a new buffer view of the same buffer, not a dispatch
+    # DeviceArray exposes its buffer view and device only as private fields, if they change between
+    # iree releases None is returned and the reshape runs as a compiled program instead
+    val = x.buf.val
+    try:
+        buffer_view, device, override_dtype = val._buffer_view, val._device, val._override_dtype
+        buffer_view = iree.runtime.HalBufferView(buffer_view.get_buffer(), shape, buffer_view.element_type)
+        return Tensor(TensorBuffer(iree.runtime.DeviceArray(device, buffer_view, override_dtype=override_dtype)))
+    except (AttributeError, TypeError):
+        return None
+
+
 @backend.set_impl(backend.operator_set.pad)
 def pad_impl(self, x, y, *, padding, mode, value):
     value = float(value) if "f" in x.symval.dtype.mlir else int(value)
     value_type = SymbolicTensor((), x.symval.dtype, x.symval.device)
-    lo = padding[0::2][::-1]
-    hi = padding[1::2][::-1]
+    padding = padding[::-1]
+    lo, hi = padding[0::2], padding[1::2]
     return f"""%{y.name}_value = stablehlo.constant dense<{value}> : {annotate_shape(value_type)}
 %{y.name} = "stablehlo.pad"(%{x.name}, %{y.name}_value) {{
   edge_padding_low = dense<{repr(list(lo))}> : tensor<{len(lo)}xi64>,
@@ -656,71 +828,38 @@ def conv_impl(self, x, w, y, *, groups, stride, dilation, padding):
 """
 
 
-# @backend.set_impl(backend.operator_set.where)
-# def where_impl(self, x, w, u, y):
-# return f"""%{y.name} = "stablehlo.select"(%{x.name}, %{w.name}, %{u.name}) : {annotate_sig((x.symval,w.symval,u.symval), y.symval)}"""
+@backend.set_impl(backend.operator_set.where)
+def where_impl(self, x, w, u, y):
+    return f'%{y.name} = "stablehlo.select"(%{x.name}, %{w.name}, %{u.name}) : {annotate_sig((x.symval, w.symval, u.symval), y.symval)}'
 
 
 @backend.set_impl(backend.operator_set.gather_nd)
 def gather_nd_impl(self, x, w, y, *, batch_dims):
-    operand_shape = list(x.symval.shape)
-    indices_shape = list(w.symval.shape)
-    r = x.symval.ndim
-    q = w.symval.ndim
-    b = batch_dims
-    offset_dims = list(range(1, q))
-    index_vector_dim = q - 1
-    y_reshape = None
-    w_arange = None
+    # batch dims are gathered as leading index coords, taken from iotas concatenated in front of w
+    q, b = w.symval.ndim, batch_dims
+    k = b + w.symval.shape[-1]
+    w_name, code = w.name, ""
     if b > 0:
-        w_arange = w.symval
-
-    if indices_shape[-1] == r:
-        slice_sizes = [1] * r
-        start_index_map = [i for i in range(q)]
-        if b != 0:
-            start_index_map = start_index_map[b:] + start_index_map[:b]
-        collapsed_slice_dims = [
-            i for i in range(1 - b, len(slice_sizes) - b) if slice_sizes[i] == 1 and operand_shape[i] == indices_shape[i]
-        ]
-
-        y_reshape = y.symval.like(shape=y.symval.shape + (1,))
-    elif indices_shape[-1] < r:
-        slice_sizes = [*[1] * (r - 1), *operand_shape[-1:]]
-        start_index_map = [i for i, s in enumerate(slice_sizes) if s == 1 and i < q]
-
-        collapsed_slice_dims = []
-        for i in range(len(slice_sizes)):
-            if slice_sizes[i] == 1 and len(offset_dims) + len(collapsed_slice_dims) != r:
-                collapsed_slice_dims += [i]
-
-        if len(collapsed_slice_dims) != len(start_index_map):
-            y_reshape = y.symval.like(shape=y.symval.shape + (1,))
-
+        iota = w.symval.like(shape=w.symval.shape[:-1] + (1,))
+        for d in range(b):
+            code += f'%{w.name}_i{d} = "stablehlo.iota"() {{iota_dimension = {d} : i64}} : {annotate_sig((), iota)}\n'
+        w_name, w_symval = f"{w.name}_", w.symval.like(shape=w.symval.shape[:-1] + (k,))
+        code += (
+            f'%{w_name} = "stablehlo.concatenate"({", ".join([f"%{w.name}_i{d}" for d in range(b)] + [f"%{w.name}"])}) '
+            f"{{dimension = {q - 1} : i64}} : {annotate_sig((iota,) * b + (w.symval,), w_symval)}\n"
+        )
     else:
-        raise ValueError
-    w_fixed = (
-        w.symval
-        if w_arange is None
-        else w.symval.like(shape=tuple(d + b if i == b else d for i, d in enumerate(w.symval.shape)), dtype=dtypes.int32)
-    )
-    w_affix = "" if w_arange is None else "_"
-    y_fixed = y.symval if y_reshape is None else y_reshape
-    y_affix = "" if y_reshape is None else "_"
-    return f"""{f'''%{w.name}_i = "stablehlo.iota"() {{ iota_dimension = 0 : i64}} : {annotate_sig((), w_arange)}
-%{w.name}_ = "stablehlo.concatenate"(%{w.name}_i, %{w.name}) {{ dimension = {b} : i64}} : {annotate_sig((w_arange, w.symval), w_fixed)}'''
-    if w_arange is not None else ''
-}%{y.name}{y_affix} = "stablehlo.gather"(%{x.name}, %{w.name}{w_affix}) {{
+        w_symval = w.symval
+    slice_sizes = [1] * k + list(x.symval.shape[k:])
+    return f"""{code}%{y.name} = "stablehlo.gather"(%{x.name}, %{w_name}) {{
 dimension_numbers = #stablehlo.gather<
-offset_dims = {offset_dims},
-collapsed_slice_dims = {collapsed_slice_dims},
-start_index_map = {start_index_map},
-index_vector_dim = {index_vector_dim}>,
+offset_dims = {list(range(q - 1, q - 1 + x.symval.ndim - k))},
+collapsed_slice_dims = {list(range(k))},
+start_index_map = {list(range(k))},
+index_vector_dim = {q - 1}>,
 slice_sizes = dense<{slice_sizes}> : tensor<{len(slice_sizes)}xi64>,
 indices_are_sorted = false
-}} : {annotate_sig((x.symval, w_fixed), y_fixed)}
-{f'%{y.name} = "stablehlo.reshape"(%{y.name}_) : {annotate_sig((y_fixed,), y.symval)}' 
-if y_reshape is not None else ''}"""
+}} : {annotate_sig((x.symval, w_symval), y.symval)}"""
 
 
 @backend.set_impl(backend.operator_set.scatter_nd)
@@ -730,28 +869,12 @@ def scatter_nd_impl(self, x, w, u, y):
 
     r = x.symval.ndim
     q = w.symval.ndim
-    s = u.symval.ndim
-    # index_vector_dim = q - 1
-    # update_window_dims = list(range(index_vector_dim, r))
-    # inserted_window_dims = [0]
-    # scatter_dims_to_operand_dims = [0]
-
+    k = w.symval.shape[-1]
+    # u is w.shape[:-1] + x.shape[k:], each index tuple of w addresses one x.shape[k:] window
     index_vector_dim = q - 1
-    update_window_dims = list(range(index_vector_dim, r)) if q <= s else []
-    # update_window_dims = []
-    inserted_window_dims = list(range(r + 1 - s))
-    scatter_dims_to_operand_dims = list(range(r + 1 - s))
-
-    # if s <= r:
-    #     index_vector_dim = 1
-    #     update_window_dims = list(range(index_vector_dim, r))
-    #     inserted_window_dims = list(range(r))
-    #     scatter_dims_to_operand_dims = list(range(r))
-    # else:
-    #     index_vector_dim = q - 1
-    #     update_window_dims = list(range(index_vector_dim, r))
-    #     inserted_window_dims = [0]
-    #     scatter_dims_to_operand_dims = [0]
+    update_window_dims = list(range(q - 1, q - 1 + r - k))
+    inserted_window_dims = list(range(k))
+    scatter_dims_to_operand_dims = list(range(k))
 
     return f"""%{y.name} = "stablehlo.scatter"(%{x.name}, %{w.name}, %{u.name}) ({{
   ^bb0(%arg0: {y_mlir_type}, %arg1: {y_mlir_type}):
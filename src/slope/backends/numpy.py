@@ -16,6 +16,7 @@ from slope.core import (
     DType,
     Device,
     CodegenOutput,
+    lru_cache_verbose,
 )
 
 import math
@@ -25,6 +26,7 @@ from typing import (
     Any,
 )
 import os
+import collections
 
 from slope.operators import operator_set
 from slope.procedures import procedure_set
@@ -34,6 +36,11 @@ import pygments
 from pygments.lexers.python import PythonLexer
 from pygments.formatters import Terminal256Formatter
 
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
 
 def annotate_shape(symval):
     xdtype = symval.dtype.mlir
@@ -73,6 +80,38 @@ class NumpyBackend(Backend):
 
     dtype_map_inv = {v: k for k, v in dtype_map.items()}
     device_map_inv = {v: k for k, v in device_map.items()}
+    # single-expression impls, formatted positionally with input names
+    impl_templates = dict()
+    impl_ufuncs = dict()
+    impl_elementwise = set()
+    numexpr_templates = dict()
+    numexpr_dtypes = (dtypes.float32, dtypes.int32, dtypes.int64, dtypes.bool)
+    numexpr_min_numel = 1 << 18
+    max_inline_depth = 32
+    # non-ufunc impls whose result is always a fresh array, never a view of an input
+    copying_impls = (operator_set.sum, operator_set.max, operator_set.softmax, operator_set.cumsum, operator_set.one_hot)
+    # source dtype -> cast targets that numpy promotion reaches exactly when mixed with a target-dtype array
+    exact_upcasts = {
+        dtypes.bool: (dtypes.float16, dtypes.float32),
+        dtypes.uint8: (dtypes.float16, dtypes.float32),
+        dtypes.int8: (dtypes.float16, dtypes.float32),
+        dtypes.float16: (dtypes.float32,),
+    }
+    # shares the bit generator of numpy's legacy global state, so np.random.seed also seeds slope's random ops
+    rng = np.random.Generator(np.random.get_bit_generator())
+
+    def seed(self, seed):
+        # reseeds the shared bit generator in place, compiled programs hold a reference to this generator
+        np.random.seed(seed)
+
+    def set_impl_template(self, op: Operator, template: str, numexpr_template: str = None, ufunc: str = None, elementwise=True):
+        self.impl_templates[op] = template
+        if elementwise:
+            self.impl_elementwise.add(op)
+        if numexpr_template is not None:
+            self.numexpr_templates[op] = numexpr_template
+        if ufunc is not None:
+            self.impl_ufuncs[op] = ufunc
 
     def from_numpy(self, val, dtype=None, device=None):
         dtype = dtype or self.DEFAULT_DTYPE
@@ -100,30 +139,173 @@ class NumpyBackend(Backend):
             assert not hasattr(self, "fn_count")
             self.fn_count = 0
 
-        def indent(code):
-            spaces = " " * (len(code) - len(code.lstrip()))
-            spaces += " " * 4
-            return "\n".join([spaces + line for line in code.strip().split("\n")])
+        indent = " " * 4  # impls emit left-aligned lines, relative indentation inside them is kept
 
         # codegen is recursive if jit-of-jit happens
         body_code_lines = []
+        impls, impl_templates, impl_ufuncs, env = self.impls, self.impl_templates, self.impl_ufuncs, program.env
+        numexpr_templates = self.numexpr_templates if numexpr is not None else dict()
+
+        # single-use outputs consumed by a template op are inlined into the consumer expression,
+        # so an elementwise chain becomes one statement without named temporaries
+        num_uses = collections.Counter(program.outs)
+        template_uses = collections.Counter()
+        non_ufunc_uses = set(program.outs)
+        for instruction in program.instructions:
+            num_uses.update(instruction.inputs)
+            if instruction.op in impl_templates:
+                template_uses.update(instruction.inputs)
+            if instruction.op not in impl_ufuncs and instruction.op not in self.copying_impls:
+                non_ufunc_uses.update(instruction.inputs)
+        inlined = dict()  # Var -> (expr, numexpr expr or None, depth, buffers freed once evaluated, buffer names read)
+
+        # float fills reached only through reshape/expand are passed to elementwise templates as the
+        # 0-d fill itself and broadcast implicitly, instead of materializing broadcast temporaries
+        scalar_src = dict()  # Var -> Var of the full it was reshaped/expanded from
+        for instruction in program.instructions:
+            if instruction.op is operator_set.full and dtypes.is_float(instruction.params["dtype"]):
+                scalar_src[instruction.out_binders[0]] = instruction.out_binders[0]
+            elif instruction.op in (operator_set.reshape, operator_set.expand) and instruction.inputs[0] in scalar_src:
+                scalar_src[instruction.out_binders[0]] = scalar_src[instruction.inputs[0]]
+            elif (
+                instruction.op in self.impl_elementwise
+                and all(x in scalar_src for x in instruction.inputs)
+                and dtypes.is_float(instruction.out_binders[0].symval.dtype)
+            ):
+                scalar_src[instruction.out_binders[0]] = instruction.out_binders[0]
+        scalar_uses = collections.Counter()
+        for instruction in program.instructions:
+            if instruction.op in self.impl_elementwise and any(x not in scalar_src for x in instruction.inputs):
+                scalar_uses.update(x for x in instruction.inputs if x in scalar_src)
+        # only read through broadcasting: fills and elementwise ops on them are emitted 0-d,
+        # reshapes and expands of them are skipped
+        scalar_only = set()
+        for instruction in reversed(program.instructions):
+            out = instruction.out_binders[0] if len(instruction.out_binders) == 1 else None
+            if out not in scalar_src or scalar_uses[out] < num_uses[out]:
+                continue
+            scalar_only.add(out)
+            scalar_uses.update(instruction.inputs)
+
+        # exact upcasts read only by sums or by elementwise templates next to a non-0-d operand of the target dtype
+        # are dropped: the consumer's ufunc loop (or sum dtype=) converts the source blockwise instead of copying it
+        upcasts = dict()  # Var -> Var it was cast from
+        for instruction in program.instructions:
+            if instruction.op is operator_set.cast and instruction.params["dtype"] in self.exact_upcasts.get(
+                instruction.inputs[0].symval.dtype, ()
+            ):
+                upcasts[instruction.out_binders[0]] = instruction.inputs[0]
+        upcast_uses, upcast_template_uses = collections.Counter(), collections.Counter()
+        for instruction in program.instructions:
+            if instruction.op is operator_set.sum:
+                upcast_uses.update(x for x in instruction.inputs if x in upcasts)
+            elif instruction.op in self.impl_elementwise:
+                for x in instruction.inputs:
+                    if x in upcasts and any(
+                        v not in upcasts and v not in scalar_src and v.symval.dtype is x.symval.dtype and v.symval.shape != ()
+                        for v in instruction.inputs
+                    ):
+                        upcast_uses[x] += 1
+                        upcast_template_uses[x] += 1
+        upcasts = {x: src for x, src in upcasts.items() if upcast_uses[x] == num_uses[x]}
+        for x, src in upcasts.items():  # consumers read src directly, so it may be inlined into them
+            num_uses[src] += num_uses[x] - 1
+            template_uses[src] += upcast_template_uses[x]
+
+        # dead float temporaries that were only read by ufuncs or copying impls (so no views of them exist)
+        # are recycled as out= buffers of later ufuncs with the same shape and dtype
+        # a dead buffer still read by a pending inlined expression is only recycled once that expression is emitted
+        remaining_uses = collections.Counter(num_uses)
+        poolable = set()
+        pool = collections.defaultdict(list)
+        inlined_reads = collections.Counter()  # buffer name -> pending inlined expressions reading it
+        deferred = []
+
+        def free(x):
+            if inlined_reads[env[x].name]:
+                deferred.append(x)
+            else:
+                pool[(env[x].shape, env[x].dtype)] += [env[x].name]
 
         for instruction in program.instructions:
             if len(instruction.out_binders) == 0:  # skip codegen for function returns nothing
                 continue
-            in_vals = list_map(lambda x: program.env[x], instruction.inputs)
-            out_vals = list_map(lambda z: program.env[z], instruction.out_binders)
-            if isinstance(instruction.op, MetaOperator):
-                impl_code, fn_defs = self.impls[instruction.op](args, instruction, fn_defs, in_vals, out_vals)
+            if instruction.out_binders[0] in scalar_only and instruction.op in (operator_set.reshape, operator_set.expand):
+                continue
+            if instruction.out_binders[0] in upcasts:
+                continue
+            in_vals = [env[x] for x in instruction.inputs]
+            out_vals = [env[z] for z in instruction.out_binders]
+            impl = impls.get(instruction.op)
+            template = impl_templates.get(instruction.op)
+            if template is not None:
+                (out,) = instruction.out_binders
+                is_scalar = out in scalar_only
+                if instruction.op in self.impl_elementwise and (is_scalar or any(x not in scalar_src for x in instruction.inputs)):
+                    in_vals = [env[scalar_src[x]] if x in scalar_src else v for x, v in zip(instruction.inputs, in_vals)]
+                in_xs = [upcasts.get(x, x) for x in instruction.inputs]
+                in_vals = [env[upcasts[x]] if x in upcasts else v for x, v in zip(instruction.inputs, in_vals)]
+                in_exprs = [inlined.pop(x, (v.name, v.name, 0, (), (v.name,))) for x, v in zip(in_xs, in_vals)]
+                reads = [r for _, _, _, _, rs in in_exprs for r in rs]
+                inlined_reads.subtract(r for _, _, d, _, rs in in_exprs if d > 0 for r in rs)
+                expr = template.format(*(e for e, _, _, _, _ in in_exprs))
+                depth = max((d for _, _, d, _, _ in in_exprs), default=0) + 1
+                frees = [f for _, _, _, fs, _ in in_exprs for f in fs]
+                for x in instruction.inputs:
+                    remaining_uses[x] -= 1
+                    if remaining_uses[x] == 0 and x in poolable:
+                        frees += [x]
+                ne_expr = None
+                if (
+                    instruction.op in numexpr_templates
+                    and not any(x in upcasts for x in instruction.inputs)
+                    and all(ne is not None for _, ne, _, _, _ in in_exprs)
+                    and all(v.symval.dtype in self.numexpr_dtypes for v in in_vals + out_vals)
+                ):
+                    ne_expr = numexpr_templates[instruction.op].format(*(ne for _, ne, _, _, _ in in_exprs))
+                (y,) = out_vals
+                if num_uses[out] == 1 and template_uses[out] == 1 and depth < self.max_inline_depth:
+                    inlined[out] = (f"({expr})", f"({ne_expr})" if ne_expr is not None else None, depth, frees, reads)
+                    inlined_reads.update(reads)
+                    continue
+                for f in frees:
+                    free(f)
+                buf = None
+                if not is_scalar and instruction.op in impl_ufuncs and all(v.dtype is y.dtype for v in in_vals) and pool[(y.shape, y.dtype)]:
+                    buf = pool[(y.shape, y.dtype)].pop()
+                if ne_expr is not None and depth > 1 and not is_scalar and math.prod(y.shape) >= self.numexpr_min_numel:
+                    # large fused chains run blockwise through numexpr without full-size temporaries
+                    impl_code = f'{y.name} = numexpr.evaluate("{ne_expr}"{f", out={buf}" if buf else ""})'
+                elif buf is not None:
+                    impl_code = f"{y.name} = {impl_ufuncs[instruction.op]}({', '.join(e for e, _, _, _, _ in in_exprs)}, out={buf})"
+                else:
+                    impl_code = f"{y.name} = {expr}"
+                if instruction.op in impl_ufuncs and out not in non_ufunc_uses and not is_scalar and y.shape != () and dtypes.is_float(y.dtype):
+                    poolable.add(out)
+            elif isinstance(instruction.op, MetaOperator):
+                impl_code, fn_defs = impl(args, instruction, fn_defs, in_vals, out_vals)
             else:
-                if instruction.op in self.impls.keys():
-                    impl_code = self.impls[instruction.op](*in_vals, *out_vals, **instruction.params)
+                if instruction.out_binders[0] in scalar_only:  # a fill only read through broadcasting
+                    impl_code = impl(*in_vals, *out_vals, **{**instruction.params, "shape": ()})
+                elif impl is not None:
+                    in_vals = [env[upcasts[x]] if x in upcasts else v for x, v in zip(instruction.inputs, in_vals)]
+                    impl_code = impl(*in_vals, *out_vals, **instruction.params)
+                    if instruction.op in self.copying_impls:
+                        for x in instruction.inputs:
+                            remaining_uses[x] -= 1
+                            if remaining_uses[x] == 0 and x in poolable:
+                                free(x)
                 else:
                     # No impl is defined, fallback to procedure
                     impl_code, fn_defs = self.codegen_impl_as_procedure(args, instruction, fn_defs, in_vals, out_vals)
 
-            for impl_code_line in impl_code.split("\n"):  # handle multi-line code
-                body_code_lines += [indent(impl_code_line)]
+            if "\n" in impl_code:
+                body_code_lines += [indent + line for line in impl_code.split("\n") if line.strip()]
+            else:
+                body_code_lines.append(indent + impl_code)
+            for x in [x for x in deferred if not inlined_reads[env[x].name]]:
+                deferred.remove(x)
+                pool[(env[x].shape, env[x].dtype)] += [env[x].name]
 
         in_binders = list_map(lambda x: program.env[x], program.in_binders)
         arg_type_strs = [f"{inb.name}" for inb in in_binders]
@@ -132,13 +314,13 @@ class NumpyBackend(Backend):
         functions_code_lines = []
         if fn_name == "main":
             for fn_def_code_lines in fn_defs.values():
-                functions_code_lines += [indent(line) for line in fn_def_code_lines]
+                functions_code_lines += [indent + line for line in fn_def_code_lines]
 
         outs = list_map(lambda x: program.env[x], program.outs)
         out_type_strs = [f"{out.name}" for out in outs]
         out_type_str = ", ".join(out_type_strs)
         head_code_line = [f"def {fn_name}({fn_args_str}): # ({out_type_str})"]
-        return_line = [indent(f"return {out_type_str}")]
+        return_line = [f"{indent}return {out_type_str}"]
         code_lines = head_code_line + functions_code_lines + body_code_lines + return_line
         if slope.LOG_JIT:
             formatted_code = pygments.highlight("\n".join(code_lines), PythonLexer(), Terminal256Formatter())
@@ -160,14 +342,15 @@ class NumpyBackend(Backend):
         op_procedure = getattr(self.procedure_set, op_name)
         symvals_in = tuple(inp.symval for inp in instruction.inputs)
         params = instruction.params
-        op_program, consts, _ = slope.core.make_program(
-            op_procedure,
-            *symvals_in,
-            static_args=tuple(params.items()),
-            name=op.name,
-        )
-        name = slope.core.jit.get_jit_name(tuple(symvals_in), params)
-        if name not in fn_defs.keys():
+        # named per op as well, so procedures with the same signature and params do not share a definition
+        name = slope.core.jit.get_jit_name(tuple(symvals_in), params, op.name)
+        if name not in fn_defs.keys():  # traced and emitted once per codegen
+            op_program, consts, _ = slope.core.make_program(
+                op_procedure,
+                *symvals_in,
+                static_args=tuple(params.items()),
+                name=op.name,
+            )
             op_codegen_output: CodegenOutput = self.codegen(
                 op_program,
                 args,
@@ -182,16 +365,23 @@ class NumpyBackend(Backend):
         return impl_code, fn_defs
 
     def compile(self, codegen_output):
+        code = "\n".join(codegen_output.code_lines)
+        fn = self.compile_code(code)
+        return fn, code
+
+    @lru_cache_verbose(maxsize=1024)
+    def compile_code(self, code: str):
+        # keyed by source, so programs that codegen to the same text share one function object
         deps_dict = dict()
         deps_dict["numpy"] = importlib.import_module("numpy")
         deps_dict["np"] = deps_dict["numpy"]
         deps_dict["math"] = importlib.import_module("math")
-        code_lines = codegen_output.code_lines
+        deps_dict["numexpr"] = numexpr
+        deps_dict["rng"] = self.rng
         exec_locals = dict()
-        code = "\n".join(code_lines)
-        exec(compile(code, "<string>", "exec"), deps_dict, exec_locals)
-        fn = exec_locals["main"]
-        return fn, code
+        code_obj = compile(code, "<slope:main>", "exec", optimize=2, dont_inherit=True)
+        exec(code_obj, deps_dict, exec_locals)
+        return exec_locals["main"]
 
     def export(self, jit_output: slope.core.JitOutput, output_path, export_params, input_names, output_names, **kwargs):
         os.makedirs(output_path, exist_ok=True)
@@ -284,97 +474,86 @@ def jit_op_impl(self, args, instruction, fn_defs, in_vals, out_vals):
 
 @backend.set_impl(operator_set.cast)
 def cast_impl(self, x, y, *, dtype):
+    if x.symval.dtype is dtype:  # astype copies even when the dtype already matches
+        return f"{y.name} = {x.name}"
     return f"{y.name} = {x.name}.astype({'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
 
 
-@backend.set_impl(backend.operator_set.stop_gradient)
-def stop_gradient_impl(self, x, y):
-    return f"{y.name} = {x.name}"
-
-
-@backend.set_impl(backend.operator_set.sqrt)
-def sqrt_impl(self, x, y):
-    return f"{y.name} = np.sqrt({x.name})"
-
-
-@backend.set_impl(backend.operator_set.exp)
-def exp_impl(self, x, y):
-    return f"{y.name} = np.exp({x.name})"
-
-
-@backend.set_impl(backend.operator_set.log)
-def log_impl(self, x, y):
-    return f"{y.name} = np.log({x.name})"
-
-
-@backend.set_impl(backend.operator_set.sin)
-def sin_impl(self, x, y):
-    return f"{y.name} = np.sin({x.name})"
-
-
-@backend.set_impl(backend.operator_set.invert)
-def invert_impl(self, x, y):
-    return f"{y.name} = ~{x.name}"
-
-
-@backend.set_impl(backend.operator_set.add)
-def add_impl(self, x, w, y):
-    return f"{y.name} = {x.name} + {w.name}"
+backend.set_impl_template(operator_set.stop_gradient, "{0}", "{0}")
+backend.set_impl_template(operator_set.sqrt, "np.sqrt({0})", "sqrt({0})", "np.sqrt")
+backend.set_impl_template(operator_set.rsqrt, "(1 / np.sqrt({0}))", "(1 / sqrt({0}))")
+backend.set_impl_template(operator_set.exp, "np.exp({0})", "exp({0})", "np.exp")
+backend.set_impl_template(operator_set.log, "np.log({0})", "log({0})", "np.log")
+backend.set_impl_template(operator_set.sin, "np.sin({0})", "sin({0})", "np.sin")
+backend.set_impl_template(operator_set.cos, "np.cos({0})", "cos({0})", "np.cos")
+backend.set_impl_template(operator_set.abs, "np.abs({0})", "abs({0})", "np.abs")
+backend.set_impl_template(operator_set.sign, "np.sign({0})", ufunc="np.sign")
+backend.set_impl_template(operator_set.invert, "~{0}", ufunc="np.invert")
+backend.set_impl_template(operator_set.add, "{0} + {1}", "{0} + {1}", "np.add")
+backend.set_impl_template(operator_set.sub, "{0} - {1}", "{0} - {1}", "np.subtract")
+backend.set_impl_template(operator_set.mul, "{0} * {1}", "{0} * {1}", "np.multiply")
+backend.set_impl_template(operator_set.div, "{0} / {1}", "{0} / {1}", "np.divide")
+backend.set_impl_template(operator_set.pow, "{0} ** {1}", "{0} ** {1}", "np.power")
+backend.set_impl_template(operator_set.equal, "{0} == {1}", "{0} == {1}", "np.equal")
+backend.set_impl_template(operator_set.less, "{0} < {1}", "{0} < {1}", "np.less")
+backend.set_impl_template(operator_set.greater, "{0} > {1}", "{0} > {1}", "np.greater")
+backend.set_impl_template(operator_set.maximum, "np.maximum({0}, {1})", ufunc="np.maximum")
+backend.set_impl_template(operator_set.relu, "np.maximum({0}, 0)")
+backend.set_impl_template(operator_set.matmul, "{0} @ {1}", ufunc="np.matmul", elementwise=False)
+backend.set_impl_template(operator_set.where, "np.where({0}, {1}, {2})", "where({0}, {1}, {2})")
+
+
+@backend.set_impl(operator_set.gather_nd)
+def gather_nd_impl(self, x, w, y, *, batch_dims):
+    # leading batch_dims are indexed by broadcasted aranges, the rest by the columns of w
+    index_depth = w.shape[-1]
+    if batch_dims == 0 and 1 < index_depth < len(x.shape):
+        # slices picked by several index columns: one raveled index array and a single take
+        inner_shape = x.shape[index_depth:]
+        flat_idx = f"np.ravel_multi_index(tuple(np.moveaxis({w.name}, -1, 0)), {x.shape[:index_depth]}, mode='wrap')"
+        return f"{y.name} = np.take({x.name}.reshape({(-1,) + inner_shape}), {flat_idx}, axis=0)"
+    if batch_dims == 0:
+        return f"{y.name} = {x.name}[(*np.moveaxis({w.name}, -1, 0),)]"
+    # one sparse np.indices call yields the broadcastable aranges for all batch dims
+    w_batch_shape = w.shape[:-1]
+    indices_shape = w_batch_shape[:batch_dims] + (1,) * (len(w_batch_shape) - batch_dims)
+    return f"{y.name} = {x.name}[(*np.indices({indices_shape}, sparse=True)[:{batch_dims}], *np.moveaxis({w.name}, -1, 0))]"
+
+
+@backend.set_impl(operator_set.scatter_nd)
+def scatter_nd_impl(self, x, w, u, y):
+    # flatten the index tuple once so the accumulation runs over a single int axis
+    index_depth = w.shape[-1]
+    flat_idx = f"np.ravel_multi_index(tuple(np.moveaxis({w.name}, -1, 0)), {x.shape[:index_depth]}, mode='wrap').reshape(-1)"
+    inner_shape = x.shape[index_depth:]
+    return f"""{y.name} = {x.name}.copy()
+np.add.at({y.name}.reshape({(-1,) + inner_shape}), {flat_idx}, {u.name}.reshape({(-1,) + inner_shape}))"""
 
 
-@backend.set_impl(backend.operator_set.sub)
-def sub_impl(self, x, w, y):
-    return f"{y.name} = {x.name} - {w.name}"
-
-
-@backend.set_impl(backend.operator_set.mul)
-def mul_impl(self, x, w, y):
-    return f"{y.name} = {x.name} * {w.name}"
-
-
-@backend.set_impl(backend.operator_set.div)
-def div_impl(self, x, w, y):
-    return f"{y.name} = {x.name} / {w.name}"
-
-
-@backend.set_impl(backend.operator_set.pow)
-def pow_impl(self, x, w, y):
-    return f"{y.name} = {x.name} ** {w.name}"
-
-
-@backend.set_impl(backend.operator_set.equal)
-def equal_impl(self, x, w, y):
-    return f"{y.name} = {x.name} == {w.name}"
-
-
-@backend.set_impl(backend.operator_set.less)
-def less_impl(self, x, w, y):
-    return f"{y.name} = {x.name} < {w.name}"
-
-
-@backend.set_impl(backend.operator_set.greater)
-def greater_impl(self, x, w, y):
-    return f"{y.name} = {x.name} > {w.name}"
-
-
-@backend.set_impl(backend.operator_set.maximum)
-def maximum_impl(self, x, w, y):
-    return f"{y.name} = np.maximum({x.name}, {w.name})"
+@backend.set_impl(operator_set.sum)
+def sum_impl(self, x, y, *, dim, keepdim):
+    if x.symval.dtype is not y.symval.dtype:  # reading the source of an elided upcast
+        return f"{y.name} = np.sum({x.name}, axis={dim}, keepdims={keepdim}, dtype=np.{self.dtype_map[y.symval.dtype]})"
+    return f"{y.name} = np.sum({x.name}, axis={dim}, keepdims={keepdim})"
 
 
-@backend.set_impl(backend.operator_set.matmul)
-def matmul_impl(self, x, w, y):
-    return f"{y.name} = {x.name} @ {w.name}"
+@backend.set_impl(operator_set.softmax)
+def softmax_impl(self, x, y, *, dim):
+    # one full-size buffer: the shifted input is exponentiated and normalized in place
+    return f"""{y.name} = {x.name} - np.max({x.name}, axis={dim}, keepdims=True)
+np.exp({y.name}, out={y.name})
+{y.name} /= np.sum({y.name}, axis={dim}, keepdims=True)"""
 
 
-# @backend.set_impl(backend.operator_set.where)
-# def where_impl(self, x, w, u, y):
-#     return f"""{y.name} = np.where({x.name}, %{w.name}, %{u.name})"""
+@backend.set_impl(operator_set.one_hot)
+def one_hot_impl(self, x, y, *, k, dtype):
+    # labels outside [0, k), negative ones included, match no column and give all-zero rows
+    return f"{y.name} = ({x.name}[..., None] == np.arange({k})).astype({'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
 
 
-@backend.set_impl(operator_set.sum)
-def sum_impl(self, x, y, *, dim, keepdim):
-    return f"{y.name} = np.sum({x.name}, axis={dim}, keepdims={keepdim})"
+@backend.set_impl(operator_set.cumsum)
+def cumsum_impl(self, x, y, *, dim):
+    return f"{y.name} = np.cumsum({x.name}, axis={dim}, dtype={x.name}.dtype)"
 
 
 @backend.set_impl(operator_set.max)
@@ -382,6 +561,11 @@ def max_impl(self, x, y, *, dim, keepdim):
     return f"{y.name} = np.max({x.name}, axis={dim}, keepdims={keepdim})"
 
 
+@backend.set_impl(operator_set.argmax)
+def argmax_impl(self, x, y, *, dim, keepdim):
+    return f"{y.name} = np.argmax({x.name}, axis={dim[0]}, keepdims={keepdim}).astype(np.int32)"
+
+
 @backend.set_impl(operator_set.arange)
 def arange_impl(self, y, *, start, stop, stride, dtype, device):
     return f"{y.name} = np.arange({start}, {stop}, {stride}, dtype={'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
@@ -389,49 +573,91 @@ def arange_impl(self, y, *, start, stop, stride, dtype, device):
 
 @backend.set_impl(operator_set.full)
 def full_impl(self, y, *, shape, fill_value, dtype, device):
+    if fill_value == 0:  # calloc'd, so untouched pages are never written
+        return f"{y.name} = np.zeros({shape}, dtype={'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
+    if not math.isfinite(fill_value):  # inf and nan have no literal
+        fill_value = f"float('{fill_value}')"
     return f"{y.name} = np.full({shape}, {fill_value}, dtype={'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
 
 
+def random_impl(self, y, method, shape, dtype):
+    # sample directly in float32 (float16 is downcast from it) instead of float64 then cast
+    np_dtype = f"{'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]}"
+    if dtype is dtypes.float32:
+        return f"{y.name} = rng.{method}({shape}, dtype=np.float32)"
+    elif dtype is dtypes.float16:
+        return f"{y.name} = rng.{method}({shape}, dtype=np.float32).astype(np.float16)"
+    return f"{y.name} = rng.{method}({shape}).astype({np_dtype})"
+
+
 @backend.set_impl(operator_set.random_uniform)
 def random_uniform_impl(self, y, *, shape, dtype, device):
-    if len(shape) > 0:
-        return f"{y.name} = {'np.array(' if shape == () else ''}np.random.uniform(low=np.zeros(shape={shape})){')' if shape == () else ''}.astype(dtype={'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
+    return random_impl(self, y, "random", shape, dtype)
 
 
 @backend.set_impl(operator_set.random_normal)
 def random_normal_impl(self, y, *, shape, dtype, device):
-    return f"{y.name} = {'np.array(' if shape == () else ''}np.random.normal(loc=np.zeros(shape={shape})){')' if shape == () else ''}.astype(dtype={'np.' if dtype is not dtypes.bool else ''}{self.dtype_map[dtype]})"
-
-
-@backend.set_impl(operator_set.pad)
-def pad_impl(self, x, *, padding, mode, value):
-    pad_width = [(lo, hi) for lo, hi in zip(padding[0::2], padding[1::2])]
-    return f"ret = np.pad({x}, {pad_width}, constant_values={value})"
+    return random_impl(self, y, "standard_normal", shape, dtype)
 
 
 @backend.set_impl(operator_set.expand)
 def expand_impl(self, x, y, *, shape):
+    if tuple(x.shape) == tuple(shape):
+        return f"{y.name} = {x.name}"
     return f"{y.name} = np.broadcast_to({x.name}, shape={shape})"
 
 
 @backend.set_impl(operator_set.reshape)
 def reshape_impl(self, x, y, *, shape):
-    return f"{y.name} = np.reshape({x.name}, newshape={shape})"
+    if tuple(x.shape) == tuple(shape):
+        return f"{y.name} = {x.name}"
+    # a view when x's strides allow it, otherwise numpy makes the one contiguous copy
+    return f"{y.name} = {x.name}.reshape({tuple(shape)})"
+
+
+@backend.set_view_impl(operator_set.reshape)
+def reshape_view_impl(self, x, *, shape):
+    return Tensor(TensorBuffer(x.buf.val.reshape(shape)))
 
 
 @backend.set_impl(operator_set.pad)
 def pad_impl(self, x, y, *, padding, mode, value):
     padding = padding[::-1]
-    pad_width = [(lo, hi) for lo, hi in zip(padding[0::2], padding[1::2])]
-    return f"{y.name} = np.pad({x.name}, {pad_width}, constant_values={value})"
+    pad_width = tuple(zip(padding[0::2], padding[1::2]))
+    if all(lo == 0 and hi == 0 for lo, hi in pad_width):
+        return f"{y.name} = {x.name}"
+    x_code = x.name
+    if any(lo < 0 or hi < 0 for lo, hi in pad_width):  # negative padding crops
+        slices = ", ".join(f"{max(-lo, 0)}:{d - max(-hi, 0)}" for (lo, hi), d in zip(pad_width, x.shape))
+        x_code = f"{x.name}[{slices}]"
+        pad_width = tuple((max(lo, 0), max(hi, 0)) for lo, hi in pad_width)
+    if all(lo == 0 and hi == 0 for lo, hi in pad_width):
+        return f"{y.name} = {x_code}"
+    # np.pad re-derives the layout in Python on every call; with static widths a fill plus
+    # one unrolled slice assignment does the same
+    slices = ", ".join(f"{lo}:{d - hi}" for (lo, hi), d in zip(pad_width, y.shape))
+    return f"""{y.name} = np.full({y.shape}, {value}, dtype={x.name}.dtype)
+{y.name}[{slices}] = {x_code}"""
+
+
+@backend.set_impl(operator_set.tile)
+def tile_impl(self, x, y, *, repeats):
+    # np.tile copies once per tiled dim, a broadcast view of x is copied once by the reshape
+    x_shape = tuple(d for s in x.shape for d in (1, s))
+    expand_shape = tuple(d for r, s in zip(repeats, x.shape) for d in (r, s))
+    return f"{y.name} = np.broadcast_to({x.name}.reshape({x_shape}), {expand_shape}).reshape({y.symval.shape})"
 
 
 @backend.set_impl(operator_set.slice)
 def slice_impl(self, x, y, *, starts, limits, strides):
-    return f"{y.name} = {x.name}[tuple(slice(s, l, st) for s, l, st in zip({starts}, {limits}, {strides}))]"
-    # slice_strs = [f"{s}:{e}:{st}" for s, e ,st in zip(starts, limits, strides)]
-    # slices = ", ".join([f"np.s_[{sl}]" for sl in slice_strs])
-    # return f"{y.name} = {x.name}[{slices}]"
+    # bounds are static, so bake them into a literal subscript without the trailing whole-dim slices
+    ndim = len(starts)
+    while ndim > 0 and (starts[ndim - 1], limits[ndim - 1], strides[ndim - 1]) == (0, x.shape[ndim - 1], 1):
+        ndim -= 1
+    if ndim == 0:
+        return f"{y.name} = {x.name}"
+    slices = [f"{s}:{l}" + (f":{st}" if st != 1 else "") for s, l, st in zip(starts[:ndim], limits[:ndim], strides[:ndim])]
+    return f"{y.name} = {x.name}[{', '.join(slices)}]"
 
 
 @backend.set_impl(operator_set.cat)
@@ -442,9 +668,16 @@ def cat_impl(self, *xs, dim):
 
 @backend.set_impl(operator_set.permute)
 def permute_impl(self, x, y, *, perm):
+    if tuple(perm) == tuple(range(len(perm))):
+        return f"{y.name} = {x.name}"
     return f"{y.name} = np.transpose({x.name}, axes={perm})"
 
 
+@backend.set_view_impl(operator_set.permute)
+def permute_view_impl(self, x, *, perm):
+    return Tensor(TensorBuffer(np.transpose(x.buf.val, axes=perm)))
+
+
 @backend.set_impl(operator_set.flip)
 def flip_impl(self, x, y, *, dim):
     return f"{y.name} = np.flip({x.name}, axis={dim})"
@@ -24,6 +24,7 @@ from typing import (
     Any,
 )
 import os
+from functools import lru_cache
 
 from slope.operators import operator_set
 from slope.procedures import procedure_set
@@ -128,15 +129,16 @@ class ONNXRuntimeBackend(Backend):
         idx = 0 if self.DEFAULT_DEVICE is not devices.metal else 1
         return self.device_map_inv[f"{tensor.buf.val.device_name()}:{idx}"]
 
+    @lru_cache(maxsize=4096)
+    def tensor_type(self, dtype, shape):
+        return f"{self.dtype_map[dtype]}[{','.join(map(str, shape))}]"
+
     def codegen(self, program: Program, args, *, fn_name: str = "main", fn_defs=dict()) -> List[Any]:
         if fn_name == "main":
             assert not hasattr(self, "fn_count")
             self.fn_count = 0
 
-        def indent(code):
-            spaces = " " * (len(code) - len(code.lstrip()))
-            spaces += " " * 4
-            return "\n".join([spaces + line for line in code.strip().split("\n")])
+        indent = " " * 4  # impls emit left-aligned lines, relative indentation inside them is kept
 
         # codegen is recursive if jit-of-jit happens
         body_code_lines = []
@@ -155,12 +157,14 @@ class ONNXRuntimeBackend(Backend):
                     # No impl is defined, fallback to procedure
                     impl_code, fn_defs = self.codegen_impl_as_procedure(args, instruction, fn_defs, in_vals, out_vals)
 
-            for impl_code_line in impl_code.split("\n"):  # handle multi-line code
-                body_code_lines += [indent(impl_code_line)]
+            if "\n" in impl_code:
+                body_code_lines += [indent + line for line in impl_code.split("\n") if line.strip()]
+            else:
+                body_code_lines.append(indent + impl_code)
 
         in_binders = list_map(lambda x: program.env[x], program.in_binders)
         arg_type_strs = (
-            [f"{self.dtype_map[inb.symval.dtype]}[{repr(list(inb.symval.shape))[1:-1]}] {inb.name}" for inb in in_binders]
+            [f"{self.tensor_type(inb.symval.dtype, inb.symval.shape)} {inb.name}" for inb in in_binders]
             if fn_name == "main"
             else [f"{inb.name}" for inb in in_binders]
         )
@@ -168,7 +172,7 @@ class ONNXRuntimeBackend(Backend):
 
         outs = list_map(lambda x: program.env[x], program.outs)
         out_type_strs = (
-            [f"{self.dtype_map[out.symval.dtype]}[{repr(list(out.symval.shape))[1:-1]}] {out.name}" for out in outs]
+            [f"{self.tensor_type(out.symval.dtype, out.symval.shape)} {out.name}" for out in outs]
             if fn_name == "main"
             else [f"{out.name}" for out in outs]
         )
@@ -205,14 +209,15 @@ class ONNXRuntimeBackend(Backend):
         op_procedure = getattr(self.procedure_set, op_name)
         symvals_in = tuple(inp.symval for inp in instruction.inputs)
         params = instruction.params
-        op_program, consts, _ = slope.core.make_program(
-            op_procedure,
-            *symvals_in,
-            static_args=tuple(params.items()),
-            name=op.name,
-        )
-        name = slope.core.jit.get_jit_name(tuple(symvals_in), params)
-        if name not in fn_defs.keys():
+        # named per op as well, so procedures with the same signature and params do not share a definition
+        name = slope.core.jit.get_jit_name(tuple(symvals_in), params, op.name)
+        if name not in fn_defs.keys():  # traced and emitted once per codegen
+            op_program, consts, _ = slope.core.make_program(
+                op_procedure,
+                *symvals_in,
+                static_args=tuple(params.items()),
+                name=op.name,
+            )
             op_codegen_output: CodegenOutput = self.codegen(
                 op_program,
                 args,
@@ -226,34 +231,41 @@ class ONNXRuntimeBackend(Backend):
         impl_code = f"{out_names} = slope.{name}({in_names})"
         return impl_code, fn_defs
 
+    @lru_cache(maxsize=256)
+    def serialized_model(self, code):
+        # parsing the textual model dominates compile and export of large programs, so it is done once per code
+        return onnx.parser.parse_model(code).SerializeToString()
+
     def compile(self, codegen_output):
         code_lines = codegen_output.code_lines
         code = "\n".join(code_lines)
-        model = onnx.parser.parse_model(code)
         device = codegen_output.outs[0].device
         target = self.target_map[device]
         session = onnxruntime.InferenceSession(
-            model.SerializeToString(),
+            self.serialized_model(code),
             self.sess_options,
             providers=[target],
         )
 
+        # binding metadata is static per program, so resolve it once instead of per call and per arg
+        in_bindings = [(in_binder.name, in_binder.dtype.numpy, in_binder.shape) for in_binder in codegen_output.in_binders]
+        out_bindings = [(out.name, *self.device_map[out.device].split(":")) for out in codegen_output.outs]
+        run_options = onnxruntime.RunOptions()
+        run_options.log_severity_level = 3
+
         def fn(*args):
             io_binding = session.io_binding()
-            for a, in_binder in zip(args, codegen_output.in_binders):
+            for a, (name, element_type, shape) in zip(args, in_bindings):
                 io_binding.bind_input(
-                    name=in_binder.name,
+                    name=name,
                     device_type=a.device_name(),
                     device_id=0,
-                    element_type=self.dtype_map_inv[a.data_type().replace("tensor(", "").replace(")", "")].numpy,
-                    shape=a.shape(),
+                    element_type=element_type,
+                    shape=shape,
                     buffer_ptr=a.data_ptr(),
                 )
-            for out in codegen_output.outs:
-                device_type, device_id = self.device_map[out.device].split(":")
-                io_binding.bind_output(out.name, device_type, int(device_id))
-            run_options = onnxruntime.RunOptions()
-            run_options.log_severity_level = 3
+            for name, device_type, device_id in out_bindings:
+                io_binding.bind_output(name, device_type, int(device_id))
             session.run_with_iobinding(io_binding, run_options)
             outputs = tuple(io_binding.get_outputs())
             return outputs
@@ -279,7 +291,7 @@ class ONNXRuntimeBackend(Backend):
         #             input_shape[dim] = dim_name
         #         input_shape = tuple(input_shape)
 
-        model = onnx.parser.parse_model(code)
+        model = onnx.ModelProto.FromString(self.serialized_model(code))  # a fresh copy, safe to add initializers to
         os.makedirs(output_path, exist_ok=True)
         in_binders = jit_output.codegen_output.in_binders
         outs = jit_output.codegen_output.outs
@@ -295,11 +307,10 @@ class ONNXRuntimeBackend(Backend):
         else:
             assert len(output_names) == len(outs)
 
-        for i in range(num_consts):
-            const_array = in_binders[i].symval.numpy()
-            const_name = input_names[i]
-            const = onnx.numpy_helper.from_array(const_array, name=const_name)
-            model.graph.initializer.append(const)
+        # from_array fills raw_data in one copy per const, and the repeated field grows once
+        model.graph.initializer.extend(
+            onnx.numpy_helper.from_array(in_binders[i].symval.numpy(), name=input_names[i]) for i in range(num_consts)
+        )
 
         onnx.save(model.SerializeToString(), os.path.join(output_path, "model.onnx"))
         input_arg_names = [ib.name for ib in in_binders[num_consts:]]
@@ -395,6 +406,12 @@ def sqrt_impl(self, x, y):
     return f"{y.name} = Sqrt({x.name})"
 
 
+@backend.set_impl(backend.operator_set.rsqrt)
+def rsqrt_impl(self, x, y):
+    return f"""{y.name}_ = Sqrt({x.name})
+{y.name} = Reciprocal({y.name}_)"""
+
+
 @backend.set_impl(backend.operator_set.exp)
 def exp_impl(self, x, y):
     return f"{y.name} = Exp({x.name})"
@@ -410,6 +427,21 @@ def sin_impl(self, x, y):
     return f"{y.name} = Sin({x.name})"
 
 
+@backend.set_impl(backend.operator_set.cos)
+def cos_impl(self, x, y):
+    return f"{y.name} = Cos({x.name})"
+
+
+@backend.set_impl(backend.operator_set.abs)
+def abs_impl(self, x, y):
+    return f"{y.name} = Abs({x.name})"
+
+
+@backend.set_impl(backend.operator_set.sign)
+def sign_impl(self, x, y):
+    return f"{y.name} = Sign({x.name})"
+
+
 @backend.set_impl(backend.operator_set.invert)
 def invert_impl(self, x, y):
     return f"{y.name} = Not({x.name})"
@@ -465,9 +497,16 @@ def matmul_impl(self, x, w, y):
     return f"{y.name} = MatMul({x.name}, {w.name})"
 
 
-# @backend.set_impl(backend.operator_set.where)
-# def where_impl(self, x, w, u, y):
-#     return f"""{y.name} = "Where"(%{x.name}, %{w.name}, %{u.name})"""
+@backend.set_impl(backend.operator_set.where)
+def where_impl(self, x, w, u, y):
+    if y.symval.dtype is not dtypes.bool:
+        return f"{y.name} = Where({x.name}, {w.name}, {u.name})"
+    # onnxruntime has no bool Where kernel, so select on uint8
+    uint8 = self.onnx_dtype_enum_map[dtypes.uint8]
+    return f"""{y.name}_w = Cast<to={uint8}>({w.name})
+{y.name}_u = Cast<to={uint8}>({u.name})
+{y.name}_ = Where({x.name}, {y.name}_w, {y.name}_u)
+{y.name} = Cast<to={self.onnx_dtype_enum_map[dtypes.bool]}>({y.name}_)"""
 
 
 @backend.set_impl(backend.operator_set.gather_nd)
@@ -515,6 +554,18 @@ def max_impl(self, x, y, *, dim, keepdim):
 {y.name} = ReduceMax<keepdims={int(keepdim)}> ({x.name}, {y.name}_dim)"""
 
 
+@backend.set_impl(operator_set.argmax)
+def argmax_impl(self, x, y, *, dim, keepdim):
+    return f"""{y.name}_ = ArgMax<axis={dim[0]}, keepdims={int(keepdim)}>({x.name})
+{y.name} = Cast<to={self.onnx_dtype_enum_map[dtypes.int32]}>({y.name}_)"""
+
+
+@backend.set_impl(operator_set.cumsum)
+def cumsum_impl(self, x, y, *, dim):
+    return f"""{y.name}_axis = Constant<value_int={dim}> ()
+{y.name} = CumSum({x.name}, {y.name}_axis)"""
+
+
 @backend.set_impl(operator_set.arange)
 def arange_impl(self, y, *, start, stop, stride, dtype, device):
     return f"""{y.name}_start = Constant<value_int={start}> ()
@@ -610,6 +661,12 @@ def pad_impl(self, x, y, *, padding, mode, value):
 {y.name} = Pad({x.name}, {y.name}_padding)"""
 
 
+@backend.set_impl(operator_set.tile)
+def tile_impl(self, x, y, *, repeats):
+    return f"""{y.name}_repeats = Constant<value=int64[{len(repeats)}] {{ {repr(list(repeats))[1:-1]} }}>()
+{y.name} = Tile({x.name}, {y.name}_repeats)"""
+
+
 @backend.set_impl(operator_set.slice)
 def slice_impl(self, x, y, *, starts, limits, strides):
     return f"""{y.name}_starts = Constant<value=int64[{len(starts)}]  {{ {repr(list(starts))[1:-1]} }}>()
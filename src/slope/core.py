@@ -29,7 +29,7 @@ import operator as operator_py
 import numpy as np
 import math
 import inspect
-from functools import partial, lru_cache
+from functools import partial, lru_cache, cached_property
 import mmap
 import traceback
 import importlib
@@ -160,14 +160,11 @@ def lru_cache_verbose(
 
         def decorated_function(*args, **kwargs) -> Any:
             result = wrapper(*args, **kwargs)
-            cache_info = wrapper.cache_info()
-
-            dblog(
-                f"{fn.__name__}.{cache_info} {args.__hash__()}",
-                enable=backend.LOG_LRU,
-            )
-            tb = "".join(traceback.format_list(traceback.extract_stack())[tb_start:tb_end]).replace("\n    ", ":\t") + "-" * 20 + "\n"
-            dblog(f"{tb}", enable=backend.LOG_LRU)
+            if backend.LOG_LRU:  # extracting the stack costs more than a cache hit
+                cache_info = wrapper.cache_info()
+                dblog(f"{fn.__name__}.{cache_info} {args.__hash__()}")
+                tb = "".join(traceback.format_list(traceback.extract_stack())[tb_start:tb_end]).replace("\n    ", ":\t") + "-" * 20 + "\n"
+                dblog(f"{tb}")
 
             return result
 
@@ -256,7 +253,7 @@ class dtypes:
 
     @classmethod
     def is_float(cls, dtype):
-        return dtype in (cls.float16, cls.bfloat16, cls.float32)
+        return dtype in (cls.float16, cls.float32)
 
 
 class Device(NamedTuple):
@@ -283,6 +280,8 @@ class devices:
 
 
 class TensorBuffer:
+    __slots__ = ["val"]
+
     def __init__(self, val):
         self.val = val
 
@@ -364,7 +363,7 @@ class Tensor:
     __rdiv__ = lambda self, other: self.div.func(other, self)
     __truediv__ = __div__
     __truerdiv__ = __rdiv__
-    __pow__ = lambda self, other: self.pow(other)
+    __pow__ = lambda self, other: self.int_pow(other) if type(other) is int and 0 < other <= 16 else self.pow(other)
     __rpow__ = lambda self, other: self.pow.func(other, self)
     __matmul__ = lambda self, other: self.matmul(other)
     __rmatmul__ = lambda self, other: self.matmul.func(other, self)
@@ -443,11 +442,15 @@ class SymbolicTensor(Tensor):
     def device(self):
         return self._device
 
+    @staticmethod
+    def intern(shape, dtype, device):
+        return _interned_symbolic_tensor(tuple(int(i) for i in shape), dtype, device)
+
     def like(self, **overrides):
         shape = overrides.get("shape", self.shape)
         dtype = overrides.get("dtype", self.dtype)
         device = overrides.get("device", self.device)
-        return SymbolicTensor(shape, dtype, device)
+        return SymbolicTensor.intern(shape, dtype, device)
 
     def str_short(self):
         return f'{str(self.dtype)}[{",".join(str(d) for d in self.shape)}]'
@@ -464,6 +467,18 @@ class SymbolicTensor(Tensor):
         return f"<SymbolicTensor: shape={self.shape}, dtype={self.dtype.name}, device={self.device}>"
 
 
+@lru_cache(maxsize=16384)
+def _cached_typecheck(op, symvals_in, devices, params):
+    return tuple(op.typecheck(*symvals_in, **dict(params)))
+
+
+# typecheck outputs are immutable, so repeated (shape, dtype, device) triples share one object
+@lru_cache(maxsize=8192)
+def _interned_symbolic_tensor(shape, dtype, device):
+    return SymbolicTensor(shape, dtype, device)
+
+
+
 # =================================
 #   Operator
 # =================================
@@ -489,7 +504,8 @@ class Operator:
         return args, params
 
     def __call__(self, *args, **params):
-        args, params = self.reorg_args(args, params)
+        if params or len(args) != self.n_args:  # plain positional calls need no reorganizing
+            args, params = self.reorg_args(args, params)
         args, params = self.args_fixer(*args, **params)
         ret = bind(self, *args, **params)
         if not self.nary_outputs:
@@ -505,16 +521,34 @@ class Operator:
     def jvp(self, *args, **params):
         raise NotImplementedError
 
+    def cached_typecheck(self, *symvals_in, **params):
+        # typecheck is pure in the input (shape, dtype, device) and params, so repeated tracing is a cache hit
+        # (concrete Tensors are not cached, they are hashed by identity and would be kept alive)
+        try:
+            devices = tuple([s._device for s in symvals_in])
+            return list(_cached_typecheck(self, symvals_in, devices, tuple(params.items())))
+        except (AttributeError, TypeError):  # concrete Tensor inputs or unhashable params
+            return self.typecheck(*symvals_in, **params)
+
     def T(self, *args, **params):
         raise NotImplementedError
 
     def vmap(self, *args, **params):
         raise NotImplementedError
 
-    def reorg_args(self, args, params):
+    @cached_property
+    def n_args(self):
+        return -1 if self.variadic_inputs else len(self.typecheck_arg_names[0])
+
+    @cached_property
+    def typecheck_arg_names(self):
         sig = inspect.signature(self.typecheck)
-        args_strs = [k for k, v in sig.parameters.items() if v.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD and k != "self"]
-        params_strs = [k for k, v in sig.parameters.items() if v.kind == inspect.Parameter.KEYWORD_ONLY and k != "self"]
+        args_strs = tuple(k for k, v in sig.parameters.items() if v.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD and k != "self")
+        params_strs = tuple(k for k, v in sig.parameters.items() if v.kind == inspect.Parameter.KEYWORD_ONLY and k != "self")
+        return args_strs, params_strs
+
+    def reorg_args(self, args, params):
+        args_strs, params_strs = self.typecheck_arg_names
 
         if args:
             if len(args) > len(args_strs):
@@ -533,7 +567,7 @@ class Operator:
     def partial_run(self, trace, tracers, **params):
         tracers_in = [trace.instantiate_const(t) for t in tracers]
         symvals_in = [t.symval for t in tracers_in]
-        symvals_out = self.typecheck(*symvals_in, **params)
+        symvals_out = self.cached_typecheck(*symvals_in, **params)
         tracers_out = [PartialRunTraceTensor(trace, make_unknown_pval(symval), None) for symval in symvals_out]
         instruction = InstructionDraft(
             self,
@@ -572,7 +606,7 @@ class MetaOperator(Operator):
 
 
 class UnaryOperator(Operator):
-    def vmap(self, x, *, dim_size, vals_in, dims_in, **params):
+    def vmap(self, dim_size, vals_in, dims_in, **params):
         (x,), (x_bdim,) = vals_in, dims_in
         return [self(x, **params)], [x_bdim]
 
@@ -584,6 +618,28 @@ class UnaryOperator(Operator):
         return [self(x, **params)], [self(x_dot, **params)]
 
 
+@lru_cache(maxsize=4096)
+def broadcast_plan(*shapes):
+    # per input: (shape to reshape to or None, shape to expand to or None)
+    ndim = max(len(shape) for shape in shapes)
+    ranked = [(1,) * (ndim - len(shape)) + shape for shape in shapes]
+    shape_ret = tuple(max(ds) for ds in zip(*ranked))
+    return tuple(
+        (r if r != shape else None, shape_ret if r != shape_ret else None) for shape, r in zip(shapes, ranked)
+    )
+
+
+def broadcast_tensors(*xs):
+    ret = []
+    for x, (reshape_to, expand_to) in zip(xs, broadcast_plan(*(x.shape for x in xs))):
+        if reshape_to is not None:
+            x = x.reshape(reshape_to)
+        if expand_to is not None:
+            x = x.expand(expand_to)
+        ret += [x]
+    return ret
+
+
 class BinaryOperator(Operator):
     boolean_output = False
 
@@ -597,17 +653,7 @@ class BinaryOperator(Operator):
         elif type(w) in TraceTensor.PYTHON_TYPES:
             w = backend.full(shape=(), fill_value=w, dtype=x.dtype)
 
-        shape_delta = x.ndim - w.ndim
-        if shape_delta > 0:
-            w = w.reshape((1,) * shape_delta + w.shape)
-        elif shape_delta < 0:
-            x = x.reshape((1,) * -shape_delta + x.shape)
-
-        shape_ret = tuple([max(x, w) for x, w in zip(x.shape, w.shape)])
-        if x.shape != shape_ret:
-            x = x.expand(shape_ret)
-        if w.shape != shape_ret:
-            w = w.expand(shape_ret)
+        x, w = broadcast_tensors(x, w)
 
         if type(x) is Tensor and isinstance(w, TraceTensor):
             x = w._trace.pure(x)
@@ -645,32 +691,32 @@ class BinaryOperator(Operator):
     def typecheck(self, x: SymbolicTensor, y: SymbolicTensor, **params) -> List[SymbolicTensor]:
         if not isinstance(x, (Tensor, SymbolicTensor)) or not isinstance(y, (Tensor, SymbolicTensor)):
             raise TypeError
-        symx = SymbolicTensor.like(x, dtype=dtypes.bool if self.boolean_output else x.dtype)
-        symy = SymbolicTensor.like(y, dtype=dtypes.bool if self.boolean_output else y.dtype)
         if x.dtype != y.dtype:
             raise TypeError(f"x.dtype ({x.dtype}) != y.dtype ({y.dtype})")
-        if symx == symy:
-            return [symx]
-        shape_delta = len(symx.shape) - len(symy.shape)
+        if x.shape == y.shape and x.device == y.device:
+            return [SymbolicTensor.intern(x.shape, dtypes.bool if self.boolean_output else x.dtype, x.device)]
+        if x.device != y.device:
+            raise TypeError(f"x.device ({x.device}) != y.device ({y.device})")
+        x_shape, y_shape = x.shape, y.shape
+        shape_delta = len(x_shape) - len(y_shape)
         if shape_delta > 0:
-            symy = symy.like(shape=(1,) * shape_delta + symy.shape)
+            y_shape = (1,) * shape_delta + y_shape
         elif shape_delta < 0:
-            symx = symx.like(shape=(1,) * -shape_delta + symx.shape)
-        if symx == symy:
-            return [symx]
-        else:
-            shape_ret = tuple([max(x, w) for x, w in zip(symx.shape, symy.shape)])
-            if symx.shape != shape_ret:
-                symx = symx.like(shape=shape_ret)
-            if symy.shape != shape_ret:
-                symy = symx.like(shape=shape_ret)
-            if symx != symy:
-                raise TypeError(f"symx ({symx}) != symy ({symy})")
-            return [symx]
+            x_shape = (1,) * -shape_delta + x_shape
+        shape_ret = tuple(a if b == 1 or a == b else b if a == 1 else -1 for a, b in zip(x_shape, y_shape))
+        if -1 in shape_ret:
+            raise TypeError(f"x.shape ({x.shape}) and y.shape ({y.shape}) are not broadcastable")
+        return [SymbolicTensor.intern(shape_ret, dtypes.bool if self.boolean_output else x.dtype, x.device)]
 
     def jvp(self, primals, tangents, **params):
         (x, w), (x_dot, w_dot) = primals, tangents
-        return [self(x, w, **params)], [self(x_dot, w_dot, **params)]
+        y = self(x, w, **params)
+        if self.boolean_output:
+            # comparisons are piecewise constant: the tangent is a 0-d zero broadcast to y's shape,
+            # which stays a view (or a folded constant under jit) instead of a full-size result
+            y_dot = backend.full(shape=(), fill_value=False, dtype=y.dtype, device=y.device).expand(y.shape)
+            return [y], [y_dot]
+        return [y], [self(x_dot, w_dot, **params)]
 
     def T(self, cotangents, x, w):
         (gL_y,) = cotangents
@@ -689,23 +735,31 @@ class ReduceOperator(Operator):
         if dim is None:
             dim = tuple(range(x.ndim))
         elif isinstance(dim, int):
-            dim = (dim,)
-        dim = tuple(a if a >= 0 else a + len(x.shape) for a in dim)
+            dim = (dim if dim >= 0 else dim + x.ndim,)
+        else:
+            dim = tuple(a if a >= 0 else a + x.ndim for a in dim)
         return (x,), dict(dim=dim, keepdim=keepdim)
 
     def vmap(self, dim_size, vals_in, dims_in, *, dim, keepdim):
         (x,), (x_bdim,) = vals_in, dims_in
-        dim = tuple(a + (x_bdim <= a) for a in dim)
-        out_bdim = x_bdim - sum(a < x_bdim for a in dim)
+        dim, out_bdim = self.vmap_plan(dim, x_bdim, keepdim)
         return [self(x, dim=dim, keepdim=keepdim)], [out_bdim]
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def vmap_plan(dim, x_bdim, keepdim):
+        dim = tuple(a + (x_bdim <= a) for a in dim)
+        out_bdim = x_bdim if keepdim else x_bdim - sum(1 for a in dim if a < x_bdim)
+        return dim, out_bdim
+
     def typecheck(self, x: SymbolicTensor, *, dim=None, keepdim=False) -> List[SymbolicTensor]:
-        dim = list(set([a + len(x.shape) if a < 0 else a for a in dim]))
+        rank = len(x.shape)
+        dim = frozenset(a + rank if a < 0 else a for a in dim)
         if keepdim:
-            new_shape = [d if i not in dim else 1 for i, d in enumerate(x.shape)]
+            new_shape = tuple(d if i not in dim else 1 for i, d in enumerate(x.shape))
         else:
-            new_shape = [d for i, d in enumerate(x.shape) if i not in dim]
-        return [SymbolicTensor.like(x, shape=tuple(new_shape))]
+            new_shape = tuple(d for i, d in enumerate(x.shape) if i not in dim)
+        return [SymbolicTensor.intern(new_shape, x.dtype, x.device)]
 
 
 class InitOperator(Operator):
@@ -725,7 +779,17 @@ class InitOperator(Operator):
 
 
 class ShapeOperator(Operator):
-    pass
+    def is_identity(self, *args, **params):
+        return False
+
+    def __call__(self, *args, **params):
+        if params or len(args) != self.n_args:
+            args, params = self.reorg_args(args, params)
+        args, params = self.args_fixer(*args, **params)
+        # relayouts that leave x as is are not bound, so they never reach a backend as copies
+        if self.is_identity(*args, **params):
+            return args[0]
+        return bind(self, *args, **params)[0]
 
 
 class GeneralReduceOperator(Operator):
@@ -790,6 +854,8 @@ class Backend:
         self.procedure_set = procedure_set
         self.node_types = dict()
         self.impls = dict()
+        # eager impls that only edit metadata and return a Tensor sharing the input buffer, or None to run the op as usual
+        self.view_impls = dict()
         self.register_node(tuple, lambda t: (None, t), lambda _, xs: tuple(xs), "tuple")
         self.register_node(list, lambda l: (None, l), lambda _, xs: list(xs), "list")
         self.register_node(
@@ -811,6 +877,12 @@ class Backend:
 
         return set_impl_
 
+    def set_view_impl(self, op: Union[types.LambdaType, types.FunctionType]):
+        def set_view_impl_(fn):
+            self.view_impls[op] = types.MethodType(fn, self)
+
+        return set_view_impl_
+
     def register_node(self, ty: Type, to_iter: Callable, from_iter: Callable, name=None) -> None:
         if name is None:
             name = str(ty)
@@ -969,12 +1041,16 @@ class Backend:
 
 
 class Var:
+    __slots__ = ["symval", "val"]
+
     def __init__(self, symval):
         self.symval = symval
         self.val = None
 
 
 class Lit:
+    __slots__ = ["symval", "val"]
+
     def __init__(self, val):
         self.symval = SymbolicTensor.like(get_symval(val))
         self.val = val
@@ -1033,24 +1109,25 @@ class Program:
     ):
         self.in_binders: Any = in_binders
         self.outs: Any = outs
-        self.instructions = self.prune_instructions(instructions, outs)
+        self.instructions = self.prune_instructions(self.fold_relayouts(instructions, outs), outs)
         self.num_consts: int = num_consts
         self.static_args = static_args
         self.name: str = name
         self.indent_amount: int = indent_amount
 
+        # SSA names are numbered per prefix with running counters, so naming is linear in program size
         self.env: Dict[ProgramEnvVar, Any] = dict()
+        counts = dict(x=0, c=0, y=0, z=0)
         for inb in self.in_binders:
             prefix = "x" if type(inb.symval) is SymbolicTensor else "c"
-            idx = sum([1 if v.name[0] == prefix else 0 for v in self.env.values()])
-            self.env[inb] = ProgramEnvVar(f"{prefix}{idx}", inb.symval, True if prefix == "c" else False)
+            self.env[inb] = ProgramEnvVar(f"{prefix}{counts[prefix]}", inb.symval, True if prefix == "c" else False)
+            counts[prefix] += 1
+        outs_set = set(self.outs)
         for instruction in self.instructions:
-            if len(instruction.out_binders) == 0:
-                continue
             for outb in instruction.out_binders:
-                prefix = "y" if outb in self.outs else "z"
-                idx = sum([1 if v.name[0] == prefix else 0 for v in self.env.values()])
-                self.env[outb] = ProgramEnvVar(f"{prefix}{idx}", outb.symval)
+                prefix = "y" if outb in outs_set else "z"
+                self.env[outb] = ProgramEnvVar(f"{prefix}{counts[prefix]}", outb.symval)
+                counts[prefix] += 1
         self.curr_repr = repr(self)
 
     def pprint_shape(self, symval, scalar_as_empty_array=False):
@@ -1162,6 +1239,32 @@ class Program:
         fn_defs[program.name] = code_lines
         return fn_defs
 
+    @staticmethod
+    def fold_relayouts(instructions, outs):
+        # a permute of a permute reads the first input with the composed perm, a reshape of a reshape reads
+        # it directly, and the intermediate is pruned when nothing else uses it
+        permute, reshape = backend.operator_set.permute, backend.operator_set.reshape
+        producers, subst, outs_set = dict(), dict(), set(outs)
+        new_instructions = []
+        for instruction in instructions:
+            inputs = [subst.get(x, x) for x in instruction.inputs]
+            op, params = instruction.op, instruction.params
+            src = producers.get(inputs[0]) if op in (permute, reshape) else None
+            if src is not None and src.op is op:
+                (y,) = instruction.out_binders
+                if op is permute:
+                    params = dict(perm=tuple(src.params["perm"][p] for p in params["perm"]))
+                inputs = [src.inputs[0]]
+                if inputs[0].symval.shape == y.symval.shape and (op is reshape or params["perm"] == tuple(range(y.symval.ndim))):
+                    if y not in outs_set:
+                        subst[y] = inputs[0]
+                        continue
+            instruction = Instruction(op, inputs, params, instruction.out_binders)
+            new_instructions.append(instruction)
+            for y in instruction.out_binders:
+                producers[y] = instruction
+        return new_instructions
+
     @staticmethod
     def prune_instructions(instructions, outs):
         graph = dict()
@@ -1173,24 +1276,20 @@ class Program:
                 for child in child_nodes:
                     graph[parent].add(child)
         visited_from_terminal = set()
-
-        def dfs(node, visited):
-            visited.add(node)
-            if node in graph:
-                for neighbor in graph[node]:
-                    if neighbor not in visited:
-                        dfs(neighbor, visited)
-
-        for terminal_node in outs:
-            dfs(terminal_node, visited_from_terminal)
+        stack = list(outs)
+        while stack:
+            node = stack.pop()
+            if node in visited_from_terminal:
+                continue
+            visited_from_terminal.add(node)
+            stack += graph.get(node, ())
         unreachable_nodes = set(graph.keys()) - visited_from_terminal
 
-        instructions_to_prune = []
-        for instruction in instructions:
-            parent_nodes, child_nodes = instruction.out_binders, instruction.inputs
-            if any(node in unreachable_nodes for node in parent_nodes) or any(node in unreachable_nodes for node in child_nodes):
-                instructions_to_prune += [instruction]
-        new_instructions = [inst for inst in instructions if inst not in instructions_to_prune]
+        new_instructions = [
+            instruction
+            for instruction in instructions
+            if not any(node in unreachable_nodes for node in (*instruction.out_binders, *instruction.inputs))
+        ]
         if backend.LOG_PROGRAM:
             LI = len(instructions)
             LNI = len(new_instructions)
@@ -1277,6 +1376,8 @@ class TreeDef(NamedTuple):
 
 
 class Leaf:
+    __slots__ = ["val"]
+
     def __init__(self, val):
         if hasattr(val, "shape"):
             val = SymbolicTensor.like(val)
@@ -1310,8 +1411,8 @@ class JitOutput:
         self.consts = consts
 
     def __call__(self, *args, **params):
-        args, in_tree = tree_flatten(args)
-        args = tree_map(lambda a: a.val if isinstance(a, Tensor) else a, args)
+        # args arrive already flat as consts + inputs
+        args = [a.val if isinstance(a, Tensor) else a for a in args]
         try:
             outs = self.fn(*args, **params)
             if not isinstance(outs, tuple):  # TODO: IREE FunctionInvoker destructure 1-tuple, need to undo
@@ -1319,7 +1420,7 @@ class JitOutput:
         except Exception as e:
             dblog(self.code, enable=backend.LOG_JIT)
             raise
-        return [backend.tensor(TensorBuffer(o)) for o in outs]
+        return [Tensor(TensorBuffer(o)) for o in outs]
 
 
 class JitOp(MetaOperator):
@@ -1439,24 +1540,22 @@ class RunTrace(Trace):
             args, params = op.reorg_args(args, params)
             args, params = op.args_fixer(*args, **params)
             ret = op.meta_impl(*args, **params)
+        elif op in backend.view_impls and (view := backend.view_impls[op](*args, **params)) is not None:
+            ret = [view]
         else:
             fn = self.get_fn(op, *tuple(SymbolicTensor.like(a) for a in args), **params)
-            # with Timing(f"RUN {op}"):ret = jit(
-            ret = jit(
-                fn,
-                static_argnames=("params",),
-                name=jit.get_jit_name(args, params, op.name),
-            )(*args, **params)
+            ret = fn(*args, **params)
 
         return ret
 
     @staticmethod
     @lru_cache_verbose()
     def get_fn(op, *symval_args, **params):
+        # one jit per op signature, so its name is built once instead of on every eager op
         def fn(*args, **params):
             return [op(*args, **params)]
 
-        return fn
+        return jit(fn, static_argnames=("params",), name=jit.get_jit_name(symval_args, params, op.name))
 
 
 class SymbolicRunTrace(Trace):
@@ -1466,7 +1565,7 @@ class SymbolicRunTrace(Trace):
 
     def run_op(self, op, tracers, params):
         symvals_in = tree_map(lambda x: x.symval, tracers)
-        symvals_out = op.typecheck(*symvals_in, **params)
+        symvals_out = op.cached_typecheck(*symvals_in, **params)
         return symvals_out
 
 
@@ -1522,7 +1621,7 @@ class VMapTraceTensor(TraceTensor):
         else:
             shape = list(symval.shape)
             del shape[self.vmap_dim]
-            return symval.like(shape=tuple(shape))
+            return SymbolicTensor.like(symval, shape=tuple(shape))
 
     def full_lower(self):
         if self.vmap_dim is None:
@@ -1623,7 +1722,7 @@ class ProgramTrace(Trace):
 
     def run_op(self, op, tracers, params):
         symvals_in = tree_map(lambda x: x.symval, tracers)
-        symvals_out = op.typecheck(*symvals_in, **params)
+        symvals_out = op.cached_typecheck(*symvals_in, **params)
 
         out_tracers = [self.builder.new_tracer(self, a) for a in symvals_out]
         inputs = [self.builder.getvar(t) for t in tracers]
@@ -1877,10 +1976,11 @@ def get_symval(x):
 
 def tree_flatten(x: Any) -> Any:
     def _tree_flatten(x_: Any) -> Tuple[Iterable, Union[TreeDef, Leaf]]:
-        node_type = None
-        for k in backend.node_types.keys():
-            if isinstance(x_, k):
-                node_type = backend.node_types[k]
+        node_type = backend.node_types.get(type(x_))
+        if node_type is None:
+            for k in backend.node_types.keys():
+                if isinstance(x_, k):
+                    node_type = backend.node_types[k]
 
         if node_type is not None:
             node_metadata, children = node_type.flatten(x_)
@@ -1898,15 +1998,17 @@ def tree_flatten(x: Any) -> Any:
 def tree_unflatten(treedef: TreeDef, xs: Tuple[Any]) -> Any:
     def _tree_unflatten(treedef_: TreeDef, xs_: Iterator) -> Any:
         if isinstance(treedef_, Leaf):
-            dblog(f"    tree leaf found: {xs_}\n", enable=backend.LOG_TREE)
+            if backend.LOG_TREE:
+                dblog(f"    tree leaf found: {xs_}\n")
             return next(xs_)
         else:
-            dblog(f"    now\n  {treedef_}", enable=backend.LOG_TREE)
+            if backend.LOG_TREE:
+                dblog(f"    now\n  {treedef_}")
             children = (_tree_unflatten(t, xs_) for t in treedef_.child_treedefs)
-            dblog(f"{children=}\n", enable=backend.LOG_TREE)
             return treedef_.node_type.unflatten(treedef_.node_metadata, children)
 
-    dblog(f"unflattening {treedef}", enable=backend.LOG_TREE)
+    if backend.LOG_TREE:
+        dblog(f"unflattening {treedef}")
     return _tree_unflatten(treedef, iter(xs))
     # with Timing(f"\nTREE:\n{treedef}"):
     #     ret = _tree_unflatten(treedef, iter(xs))
@@ -2711,7 +2813,7 @@ class jit:
             for a in args:
                 name += f"shape_{a.shape}_dtype_{a.dtype.name}_"
             for k, v in static_args.items():
-                name += f"{k}_{v}_"
+                name += f"{k}_{v.name if isinstance(v, DType) else v}_"
             name = name.replace("(", "L")
             name = name.replace(")", "R")
             name = name.replace(",", "C")
@@ -1,5 +1,5 @@
 import slope
-from slope.core import Tensor, SymbolicTensor, TreeDef
+from slope.core import Tensor, SymbolicTensor, TreeDef, list_map, unzip2
 from typing import Tuple, List, Optional
 from operator import attrgetter
 
@@ -32,6 +32,9 @@ class Module:
             if isinstance(v, (Tensor, SymbolicTensor)):
                 tensor_attrs[k] = None
             elif isinstance(v, (list, tuple)) and not isinstance(v, TreeDef):
+                # containers of python scalars, e.g. shape tuples, are static
+                if len(v) > 0 and isinstance(v[0], (int, float, bool, str)):
+                    continue
                 v_flat, v_treedef = slope.tree_flatten(v)
                 if all(isinstance(vi, (Tensor, SymbolicTensor)) for vi in v_flat):
                     tensor_attrs[k] = None
@@ -80,18 +83,17 @@ class Module:
         tensor_attrs = set()
         module_attrs = set()
 
-        def find(obj, prefix):
-            nonlocal tensor_attrs, module_attrs
+        stack = [("", self)]
+        while stack:
+            prefix, obj = stack.pop()
             if isinstance(obj, (Tensor, SymbolicTensor)):
                 tensor_attrs.add(prefix.strip("."))
-                return
-            if isinstance(obj, Module):
+            elif isinstance(obj, Module):
                 if obj is not self:
                     module_attrs.add(prefix.strip("."))
                 for k, v in obj.__dict__.items():
-                    find(v, f"{prefix}{str(k)}.")
-
-        find(self, "")
+                    if isinstance(v, (Tensor, SymbolicTensor, Module)):
+                        stack.append((f"{prefix}{k}.", v))
         static_dict = {k: v for k, v in self.__dict__.items() if k not in tuple(tensor_attrs) + tuple(module_attrs)}
         return dict(
             cls=self.__class__,
@@ -158,8 +160,9 @@ except:
 
 
 class Optimizer(Module):
-    def __init__(self, params, lr: float, filter_fn=None):
+    def __init__(self, params, lr: float, filter_fn=None, fused=False):
         self.params_treedef = slope.tree_flatten(params)[1]
+        self.fused = fused
         self.state = Module()
         self.hp = Module()
         self.hp.lr = slope.full((), lr)
@@ -170,29 +173,28 @@ class Optimizer(Module):
     def step(self, p, g, *state_attrs):
         return p, state_attrs
 
+    @staticmethod
+    def flat_cat(xs):
+        return slope.cat([x.reshape(-1) for x in xs], dim=0)
+
+    def state_like(self, params, fn):
+        # fused optimizers keep a single flat state buffer for all params
+        if self.fused:
+            return fn(self.flat_cat(slope.tree_flatten(params)[0]))
+        return slope.tree_map(fn, params)
+
     def __call__(self, params, g_params, nan_to_zero=False):
-        state_names, state_attrs = zip(*self.state.get_modules(with_name=True).items())
         if nan_to_zero:
             g_params = slope.tree_map(lambda x: (x == slope.tensor([float("nan")])).where(0.0, x), g_params)
-        if self.filter_fn is None:
-            step_out, (leaf0, leaf0_treedef) = slope.tree_map(self.step, params, *(g_params, *state_attrs), out_leaf=True)
-        # TODO: only update for params updatable True
+        params_flat, params_treedef = slope.tree_flatten(params)
+        g_params_flat, g_params_treedef = slope.tree_flatten(g_params)
+        assert params_treedef == g_params_treedef == self.params_treedef
+        if self.fused:
+            assert self.filter_fn is None
+            params_out_flat, state = self.fused_call(params_flat, g_params_flat)
         else:
-            raise NotImplementedError
-
-            def where_step(params, *args):
-                def noop(p, *_):
-                    return (p, ())
-
-                return slope.where(self.filter_fn, self.step(params, *args), noop(p))
-
-            step_out, (leaf0, leaf0_treedef) = slope.tree_map(where_step, params, *(g_params, *state_attrs), out_leaf=True)
-
-        step_out_T = slope.tree_transpose(self.params_treedef, leaf0_treedef, step_out)
-        params_out, state = step_out_T
-        # params_out, *state_attrs_out = step_out_T
-        # for n, a  in zip(state_names, state_attrs_out):
-        #     setattr(self.state, n, a)
+            params_out_flat, state = self.unfused_call(params_flat, g_params_flat)
+        params_out = slope.tree_unflatten(self.params_treedef, params_out_flat)
         if nan_to_zero:
             params_out = slope.tree_map(lambda x: (x == slope.tensor([float("nan")])).where(0.0, x), params_out)
         self.state = state
@@ -200,15 +202,39 @@ class Optimizer(Module):
 
         return (params_out, self)
 
+    def fused_call(self, params_flat, g_params_flat):
+        p, state = self.step(self.flat_cat(params_flat), self.flat_cat(g_params_flat), *self.state.get_tensors())
+        params_out_flat = []
+        start = 0
+        for param in params_flat:
+            size = math.prod(param.shape)
+            params_out_flat += [p.slice(starts=(start,), limits=(start + size,)).reshape(param.shape)]
+            start += size
+        return params_out_flat, state
+
+    def unfused_call(self, params_flat, g_params_flat):
+        state_flats = [slope.tree_flatten(s)[0] for s in self.state.get_modules()]
+        if self.filter_fn is None:
+            step_out = list_map(self.step, params_flat, g_params_flat, *state_flats)
+        # TODO: only update for params updatable True
+        else:
+            raise NotImplementedError
+
+        # transpose per-param (p, state) leaves into (params, state) trees of params_treedef
+        step_out_flats, step_out_treedefs = unzip2(list_map(slope.tree_flatten, step_out))
+        subtrees = [slope.tree_unflatten(self.params_treedef, leaves) for leaves in zip(*step_out_flats)]
+        _, state = slope.tree_unflatten(step_out_treedefs[0], subtrees)
+        return [p for p, _ in step_out], state
+
 
 class GD(Optimizer):
-    def __init__(self, params, lr=0.001):
-        super().__init__(params, lr)
+    def __init__(self, params, lr=0.001, fused=False):
+        super().__init__(params, lr, fused=fused)
 
     def step(self, p, g, *_):
         lr = self.hp.lr
         p = p - lr * g
-        return p, ()
+        return p, Module()
 
 
 class SGD(Optimizer):
@@ -219,12 +245,13 @@ class SGD(Optimizer):
         momentum: float = 0,
         weight_decay=0.0,
         nesterov=False,
+        fused=False,
     ):
-        super().__init__(params, lr)
+        super().__init__(params, lr, fused=fused)
         self.hp.momentum = momentum
         self.hp.weight_decay = weight_decay
         self.hp.nesterov = nesterov
-        self.state.b = slope.tree_map(lambda x: x.zeros_like(), params)
+        self.state.b = self.state_like(params, lambda x: x.zeros_like())
 
     def step(self, p, g, b):
         lr, m, wd = self.hp.lr, self.hp.momentum, self.hp.weight_decay
@@ -238,27 +265,28 @@ class SGD(Optimizer):
 
 
 class Adam(Optimizer):
-    def __init__(self, params, lr=0.001, b1=0.9, b2=0.999, eps=1e-5, weight_decay=0.0):
-        super().__init__(params, lr)
+    def __init__(self, params, lr=0.001, b1=0.9, b2=0.999, eps=1e-5, weight_decay=0.0, fused=False):
+        super().__init__(params, lr, fused=fused)
         self.hp.b1 = b1
         self.hp.b2 = b2
         self.hp.eps = eps
         self.hp.wd = weight_decay
-        self.state.m = slope.tree_map(lambda x: x.ones_like(), params)
-        self.state.v = slope.tree_map(lambda x: x.ones_like(), params)
+        self.state.m = self.state_like(params, lambda x: x.ones_like())
+        self.state.v = self.state_like(params, lambda x: x.ones_like())
 
     def step(self, p, g, m, v):
         lr, wd = self.hp.lr, self.hp.wd
         b1, b2, eps = self.hp.b1, self.hp.b2, self.hp.eps
-        i = self.iters + 1  # slope.ones_like(self.iters)
+        i = (self.iters + 1).cast(p.dtype)
         m = b1 * m + (1.0 - b1) * g
         v = b2 * v + (1.0 - b2) * (g * g)
-        m_hat = m / (1.0 - b1**i)
-        v_hat = v / (1.0 - b2**i)
-        up = m_hat / ((v_hat).sqrt() + eps)
+        # fold bias corrections into scalars, m_hat / (sqrt(v_hat) + eps) without materializing m_hat, v_hat
+        c2_sqrt = (1.0 - b2**i).sqrt()
+        step_size = lr * c2_sqrt / (1.0 - b1**i)
+        up = m / (v.sqrt() + eps * c2_sqrt)
         if wd > 0:
-            up = up + wd * p.stop_gradient()
-        p = p - lr * up
+            p = p - (lr * wd) * p.stop_gradient()
+        p = p - step_size * up
         state = Module()
         state.m = m
         state.v = v
@@ -389,16 +417,16 @@ def compute_fans(shape: Sequence, in_dim=-2, out_dim=-1, batch_dim=()):
     if isinstance(in_dim, int):
         in_size = shape[in_dim]
     else:
-        in_size = int(np.prod([shape[i] for i in in_dim]))
+        in_size = math.prod(shape[i] for i in in_dim)
     if isinstance(out_dim, int):
         out_size = shape[out_dim]
     else:
-        out_size = int(np.prod([shape[i] for i in out_dim]))
+        out_size = math.prod(shape[i] for i in out_dim)
     if isinstance(batch_dim, int):
         batch_size = shape[batch_dim]
     else:
-        batch_size = int(np.prod([shape[i] for i in batch_dim]))
-    receptive_field_size = math.prod(shape) / in_size / out_size / batch_size
+        batch_size = math.prod(shape[i] for i in batch_dim)
+    receptive_field_size = math.prod(shape) // (in_size * out_size * batch_size)
     fan_in = in_size * receptive_field_size
     fan_out = out_size * receptive_field_size
     return fan_in, fan_out
@@ -12,6 +12,7 @@ from slope.core import (
     Tensor,
     SymbolicTensor,
     UndefinedPrimal,
+    TraceTensor,
     list_zip,
     dtypes,
     NullCotangent,
@@ -31,8 +32,7 @@ from typing import (
     NamedTuple,
 )
 from collections import defaultdict
-import iree.compiler
-import iree.runtime
+from functools import lru_cache
 import os
 
 
@@ -51,7 +51,8 @@ operator_set = OperatorSet()
 class StopGradient(UnaryOperator):
     def jvp(self, primals, tangents, **params):
         (x,), (x_dot,) = primals, tangents
-        return [x], [NullCotangent(x_dot)]
+        y_dot = slope.core.backend.full(shape=(), fill_value=0, dtype=x.dtype, device=x.device).expand(x.shape)
+        return [x], [y_dot]
 
     def T(self, cotangents, x):
         return [NullCotangent]
@@ -60,7 +61,7 @@ class StopGradient(UnaryOperator):
 @operator_set.register("cast", aliases=["astype"])
 class Cast(UnaryOperator):
     def typecheck(self, x: SymbolicTensor, *, dtype) -> List[SymbolicTensor]:
-        return [SymbolicTensor(x.shape, dtype, x.device)]
+        return [SymbolicTensor.intern(x.shape, dtype, x.device)]
 
     def jvp(self, primals, tangents, *, dtype):
         (x,), (x_dot,) = primals, tangents
@@ -83,15 +84,61 @@ class Sqrt(UnaryOperator):
         return [gL_y / (x.sqrt() * 2)]
 
 
+@operator_set.register("rsqrt")
+class Rsqrt(UnaryOperator):
+    def jvp(self, primals, tangents, **params):
+        (x,), (x_dot,) = primals, tangents
+        y = x.rsqrt()
+        return [y], [x_dot * (y * y * y * -0.5)]
+
+    def T(self, cotangents, x):
+        (gL_y,) = cotangents
+        y = x.rsqrt()
+        return [gL_y * (y * y * y * -0.5)]
+
+
 @operator_set.register("sin")
 class Sin(UnaryOperator):
     def jvp(self, primals, tangents, **params):
         (x,), (x_dot,) = primals, tangents
-        return [x.sin()], [(x_dot * ((math.pi / 2) - x).sin())]
+        return [x.sin()], [x_dot * x.cos()]
+
+    def T(self, cotangents, x):
+        (gL_y,) = cotangents
+        return [gL_y * x.cos()]
+
+
+@operator_set.register("cos")
+class Cos(UnaryOperator):
+    def jvp(self, primals, tangents, **params):
+        (x,), (x_dot,) = primals, tangents
+        return [x.cos()], [-(x_dot * x.sin())]
+
+    def T(self, cotangents, x):
+        (gL_y,) = cotangents
+        return [-(gL_y * x.sin())]
+
+
+@operator_set.register("abs")
+class Abs(UnaryOperator):
+    def jvp(self, primals, tangents, **params):
+        (x,), (x_dot,) = primals, tangents
+        return [x.abs()], [x_dot * x.sign()]
 
     def T(self, cotangents, x):
         (gL_y,) = cotangents
-        return [(gL_y * ((math.pi / 2) - x).sin())]
+        return [gL_y * x.sign()]
+
+
+@operator_set.register("sign")
+class Sign(UnaryOperator):
+    def jvp(self, primals, tangents, **params):
+        (x,), (x_dot,) = primals, tangents
+        y_dot = slope.core.backend.full(shape=(), fill_value=0, dtype=x.dtype, device=x.device).expand(x.shape)
+        return [x.sign()], [y_dot]
+
+    def T(self, cotangents, x):
+        return [NullCotangent]
 
 
 @operator_set.register("exp")
@@ -120,7 +167,7 @@ class Log(UnaryOperator):
 @operator_set.register("invert")
 class Invert(UnaryOperator):
     def typecheck(self, x, **params):
-        return [SymbolicTensor(x.shape, dtypes.bool, x.device)]
+        return [SymbolicTensor.intern(x.shape, dtypes.bool, x.device)]
 
     def jvp(self, primals, tangents, **params):
         (x,), (x_dot,) = primals, tangents
@@ -136,7 +183,7 @@ class ReLUOp(slope.core.UnaryOperator):
     def jvp(self, primals, tangents):
         (x,), (x_dot,) = primals, tangents
         y = x.relu()
-        y_dot = x_dot * (x == y).where(slope.ones_like(x), slope.zeros_like(x))
+        y_dot = (x == y).where(x_dot, 0.0)
         return [y], [y_dot]
 
     def T(self, cotangents, x):
@@ -191,7 +238,9 @@ class Mul(BinaryOperator):
 class Div(BinaryOperator):
     def jvp(self, primals, tangents):
         (x, w), (x_dot, w_dot) = primals, tangents
-        return [x / w], [(x_dot / w) + (-w_dot * x * 1 / (w * w))]
+        y = x / w
+        # x_dot / w - w_dot * x / w**2, reusing y = x / w
+        return [y], [(x_dot - w_dot * y) / w]
 
     def T(self, cotangents, x, w):
         (gL_y,) = cotangents
@@ -204,7 +253,7 @@ class Pow(BinaryOperator):
         (x, w), (x_dot, w_dot) = primals, tangents
         y = x**w
         y_dot1 = x_dot * (w * (x ** (w - slope.ones_like(w))))
-        y_dot2 = w_dot * (y * (x if x != 0.0 else slope.zeros_like(x)).log())
+        y_dot2 = w_dot * (y * (x != 0.0).where(x.log(), 0.0))
         return [y], [y_dot1 + y_dot2]
 
     def T(self, cotangents, x, w):
@@ -215,21 +264,18 @@ class Pow(BinaryOperator):
         elif type(w) is UndefinedPrimal:
             return [
                 NullCotangent,
-                gL_y * ((x**w) * (x.log() if x != 0.0 else slope.zeros_like(x))),
+                gL_y * ((x**w) * (x != 0.0).where(x.log(), 0.0)),
             ]
 
 
 @operator_set.register("maximum")
 class Maximum(BinaryOperator):
     def jvp(self, primals, tangents):
-        def _balanced_eq(x, z, y):
-            xz = (x == z).where(slope.ones_like(z), slope.zeros_like(z))
-            yz = (y == z).where(slope.full_like(z, 2), slope.ones_like(z))
-            return xz / yz
-
         (x, w), (x_dot, w_dot) = primals, tangents
         y = x.maximum(w)
-        y_dot = x_dot * _balanced_eq(x, y, w) + w_dot * _balanced_eq(w, y, x)
+        # share of the tangent routed to x: 1 where x wins, 0.5 on ties, 0 where w wins; w gets the rest
+        x_share = (x > w).cast(x_dot.dtype) + (x == w).cast(x_dot.dtype) * 0.5
+        y_dot = w_dot + (x_dot - w_dot) * x_share
         return [y], [y_dot]
 
     def T(self, cotangents, x, w):
@@ -263,15 +309,9 @@ class Max(ReduceOperator):
         y = x.max(dim, keepdim)
         y_ = y
         if not keepdim:
-            dim = tuple([a if a >= 0 else len(y.shape) + a + 1 for a in dim])
-            for a in reversed(sorted(dim)):
-                y_ = y_.reshape(y.shape[:a] + (1,) + y.shape[a:])
+            y_ = y_.reshape(tuple(1 if i in dim else d for i, d in enumerate(x.shape)))
         locs = x.equal(y_.expand(x.shape))
-        locs = locs.cast(x_dot.dtype)
-        counts = locs.sum(dim, keepdim)
-        y_dot = (x_dot * locs).sum(dim, keepdim)
-        y_dot = y_dot / counts.expand(y_dot.shape)
-
+        y_dot = locs.where(x_dot, 0.0).sum(dim, keepdim) / locs.cast(x_dot.dtype).sum(dim, keepdim)
         return [y], [y_dot]
 
     def T(self, cotangents, x, *, dim, keepdim):
@@ -279,10 +319,28 @@ class Max(ReduceOperator):
         (gL_y,) = cotangents
         gL_x = gL_y
         if not keepdim:
-            dim = [a if a >= 0 else len(gL_x.shape) + a + 1 for a in dim]
-            for a in reversed(sorted(dim)):
-                gL_x = gL_x.reshape(gL_x.shape[:a] + (1,) + gL_x.shape[a:])
+            gL_x = gL_x.reshape(tuple(1 if i in dim else d for i, d in enumerate(x.symval.shape)))
         gL_x = gL_x.expand(x.symval.shape)
+        return [gL_x]
+
+
+@operator_set.register("argmax")
+class Argmax(ReduceOperator):
+    def args_fixer(self, x, *, dim=None, keepdim=False):
+        if dim is None:  # index into the flattened x
+            x, dim = x.reshape(-1), 0
+        (dim,) = (dim,) if type(dim) is int else dim
+        return (x,), dict(dim=(dim + x.ndim if dim < 0 else dim,), keepdim=keepdim)
+
+    def typecheck(self, x: SymbolicTensor, *, dim, keepdim) -> List[SymbolicTensor]:
+        (y,) = super().typecheck(x, dim=dim, keepdim=keepdim)
+        return [y.like(dtype=dtypes.int32)]
+
+    def jvp(self, primals, tangents, *, dim, keepdim):
+        (x,), _ = primals, tangents
+        y = x.argmax(dim, keepdim)
+        y_dot = slope.core.backend.full(shape=(), fill_value=0, dtype=y.dtype, device=y.device).expand(y.shape)
+        return [y], [y_dot]
 
 
 @operator_set.register("sum")
@@ -296,21 +354,78 @@ class Sum(ReduceOperator):
     def T(self, cotangents, x, *, dim, keepdim):
         (gL_y,) = cotangents
         gL_x = gL_y
+        if not dim:
+            return [gL_x]
         if not keepdim:
-            dim = [a if a >= 0 else len(gL_x.shape) + a + 1 for a in dim]
-            for a in reversed(sorted(dim)):
-                gL_x = gL_x.reshape(gL_x.shape[:a] + (1,) + gL_x.shape[a:])
+            gL_x = gL_x.reshape(tuple(1 if i in dim else d for i, d in enumerate(x.symval.shape)))
         gL_x = gL_x.expand(x.symval.shape)
-
         return [gL_x]
 
 
+@operator_set.register("softmax")
+class Softmax(UnaryOperator):
+    def args_fixer(self, x, *, dim=-1):
+        return (x,), dict(dim=dim + x.ndim if dim < 0 else dim)
+
+    def typecheck(self, x, *, dim):
+        return [SymbolicTensor.like(x)]
+
+    def vmap(self, dim_size, vals_in, dims_in, *, dim):
+        (x,), (x_bdim,) = vals_in, dims_in
+        x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
+        return [self(x, dim=dim + 1)], [0]
+
+    def jvp(self, primals, tangents, *, dim):
+        (x,), (x_dot,) = primals, tangents
+        y = self(x, dim=dim)
+        y_dot = y * (x_dot - (y * x_dot).sum(dim, keepdim=True))
+        return [y], [y_dot]
+
+
+@operator_set.register("cumsum")
+class Cumsum(UnaryOperator):
+    def args_fixer(self, x, *, dim=0):
+        return (x,), dict(dim=dim + x.ndim if dim < 0 else dim)
+
+    def typecheck(self, x, *, dim):
+        return [SymbolicTensor.like(x)]
+
+    def vmap(self, dim_size, vals_in, dims_in, *, dim):
+        (x,), (x_bdim,) = vals_in, dims_in
+        x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
+        return [self(x, dim=dim + 1)], [0]
+
+    def jvp(self, primals, tangents, *, dim):
+        (x,), (x_dot,) = primals, tangents
+        return [self(x, dim=dim)], [self(x_dot, dim=dim)]
+
+    def T(self, cotangents, x, *, dim):
+        (gL_y,) = cotangents
+        # every x[i] reaches y[j] for j >= i, so the cotangent is a reversed cumsum
+        return [self(gL_y.flip(dim), dim=dim).flip(dim)]
+
+
+@operator_set.register("one_hot")
+class OneHot(UnaryOperator):
+    def args_fixer(self, x, k, *, dtype=dtypes.int32):
+        return (x,), dict(k=k, dtype=dtype)
+
+    def typecheck(self, x, *, k, dtype):
+        return [SymbolicTensor.intern(x.shape + (k,), dtype, x.device)]
+
+    def jvp(self, primals, tangents, *, k, dtype):
+        (x,), _ = primals, tangents
+        y = self(x, k, dtype=dtype)
+        y_dot = slope.core.backend.full(shape=(), fill_value=0, dtype=y.dtype, device=y.device).expand(y.shape)
+        return [y], [y_dot]
+
+
 # -----------------------
 # Shape
 # -----------------------
 
 
-@operator_set.register("expand")
+@operator_set.register("expand", variadic_inputs=True)
 class Expand(ShapeOperator):
     def args_fixer(self, x, *args, **kwargs):
         if "shape" in kwargs.keys():
@@ -328,12 +443,14 @@ class Expand(ShapeOperator):
         shape = tuple(shape)
         assert len(x.shape) == len(shape)
         assert all(a <= b for a, b in zip(x.shape, shape))
-        return [SymbolicTensor(tuple(shape), x.dtype, x.device)]
+        return [SymbolicTensor.intern(tuple(shape), x.dtype, x.device)]
 
     def vmap(self, dim_size, vals_in, dims_in, *, shape):
         (x,), (x_bdim,) = vals_in, dims_in
+        if x_bdim is None:
+            return [self(x, shape=shape)], [None]
         shape = shape[:x_bdim] + (dim_size,) + shape[x_bdim:]
-        return [self(x, shape)], [x_bdim]
+        return [self(x, shape=shape)], [x_bdim]
 
     def jvp(self, primals, tangents, *, shape, dim=None):
         (x,), (x_dot,) = primals, tangents
@@ -344,20 +461,50 @@ class Expand(ShapeOperator):
 
     def T(self, cotangents, x, *, shape):
         (gL_y,) = cotangents
-        gL_x = gL_y
-        if x.symval.shape == gL_x.shape:
-            return [gL_x]
-        else:
-            b_dim = []
-            assert len(x.symval.shape) == len(gL_x.shape)
-            for i, (xd, od) in enumerate(zip(x.symval.shape, gL_x.shape)):
-                if xd != od:
-                    b_dim += [i]
-            gL_x = gL_x.sum(dim=tuple(b_dim), keepdim=True)
-        if gL_x.shape != x.symval.shape:
-            raise ValueError(f"not same {gL_x.shape=}, {x.symval.shape=}")
+        b_dim = self.T_sum_dims(x.symval.shape, gL_y.shape)
+        if not b_dim:
+            return [gL_y]
+        gL_x = gL_y.sum(dim=b_dim, keepdim=True)
+        assert gL_x.shape == x.symval.shape, f"not same {gL_x.shape=}, {x.symval.shape=}"
         return [gL_x]
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def T_sum_dims(x_shape, y_shape):
+        assert len(x_shape) == len(y_shape)
+        return tuple(i for i, (xd, yd) in enumerate(zip(x_shape, y_shape)) if xd != yd)
+
+
+@operator_set.register("tile")
+class Tile(ShapeOperator):
+    def args_fixer(self, x, repeats):
+        repeats = tuple(repeats)
+        if len(repeats) > x.ndim:
+            x = x.reshape((1,) * (len(repeats) - x.ndim) + x.shape)
+        repeats = (1,) * (x.ndim - len(repeats)) + repeats
+        return (x,), dict(repeats=repeats)
+
+    def is_identity(self, x, *, repeats):
+        return all(r == 1 for r in repeats)
+
+    def typecheck(self, x: SymbolicTensor, *, repeats) -> List[SymbolicTensor]:
+        return [SymbolicTensor.intern(tuple(r * d for r, d in zip(repeats, x.shape)), x.dtype, x.device)]
+
+    def vmap(self, dim_size, vals_in, dims_in, *, repeats):
+        (x,), (x_bdim,) = vals_in, dims_in
+        x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
+        return [self(x, (1,) + repeats)], [0]
+
+    def jvp(self, primals, tangents, *, repeats):
+        (x,), (x_dot,) = primals, tangents
+        return [self(x, repeats)], [self(x_dot, repeats)]
+
+    def T(self, cotangents, x, *, repeats):
+        (gL_y,) = cotangents
+        # every tile of y holds a copy of x, so the tiles are summed
+        gL_y = gL_y.reshape(tuple(d for r, s in zip(repeats, x.symval.shape) for d in (r, s)))
+        return [gL_y.sum(dim=tuple(range(0, 2 * len(repeats), 2)))]
+
 
 @operator_set.register("reshape", variadic_inputs=True, aliases=["view"])
 class Reshape(ShapeOperator):
@@ -369,20 +516,22 @@ class Reshape(ShapeOperator):
         else:
             shape = args
         shape = tuple(shape)
-        if -1 in shape:
-            others = math.prod([d for d in shape if d != -1])
-            numel = math.prod(x.shape)
-            shape = tuple(d if d != -1 else (numel // others) for d in shape)
-        return (x,), dict(shape=shape)
+        if -1 not in shape:
+            return (x,), dict(shape=shape)
+        missing = x.numel() // -math.prod(shape)
+        return (x,), dict(shape=tuple(d if d != -1 else missing for d in shape))
+
+    def is_identity(self, x, *, shape):
+        return shape == x.shape
 
     def vmap(self, dim_size, vals_in, dims_in, *, shape):
         (x,), (x_bdim,) = vals_in, dims_in
         x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
         y = self(x, tuple(x.shape[:1] + shape))
-        return [y], [x_bdim]
+        return [y], [0]
 
     def typecheck(self, x: SymbolicTensor, *, shape: Sequence[int]) -> List[SymbolicTensor]:
-        return [SymbolicTensor(tuple(shape), x.dtype, x.device)]
+        return [SymbolicTensor.intern(tuple(shape), x.dtype, x.device)]
 
     def jvp(self, primals, tangents, *, shape):
         (x,), (x_dot,) = primals, tangents
@@ -405,18 +554,26 @@ class Permute(ShapeOperator):
         perm = tuple(perm)
         return (x,), dict(perm=perm)
 
+    def is_identity(self, x, *, perm):
+        return all(i == p for i, p in enumerate(perm))
+
     def typecheck(self, x: SymbolicTensor, *, perm: Sequence[int]) -> List[SymbolicTensor]:
         assert tuple(sorted(perm)) == tuple(range(x.ndim))
         shape = [x.shape[i] for i in perm]
-        return [SymbolicTensor(shape, x.dtype, x.device)]
+        return [SymbolicTensor.intern(shape, x.dtype, x.device)]
 
     def vmap(self, dim_size, vals_in, dims_in, *, perm):
         (x,), (x_bdim,) = vals_in, dims_in
         assert x_bdim >= 0
-        perm = perm[:x_bdim] + [x_bdim] + perm[x_bdim:]
+        return [x.permute(self.vmap_perm(tuple(perm), x_bdim))], [x_bdim]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def vmap_perm(perm, x_bdim):
+        perm = perm[:x_bdim] + (x_bdim,) + perm[x_bdim:]
         perm = tuple(d + int(d >= x_bdim) if i != x_bdim else d for i, d in enumerate(perm))
         assert len(set(perm)) == len(perm)
-        return [x.permute(perm)], [x_bdim]
+        return perm
 
     def jvp(self, primals, tangents, *, perm):
         (x,), (x_dot,) = primals, tangents
@@ -424,8 +581,15 @@ class Permute(ShapeOperator):
 
     def T(self, cotangents, x, *, perm):
         (z,) = cotangents
-        inv_perm = tuple(i[0] for i in sorted(enumerate(perm), key=lambda x: x[1]))
-        return [z.permute(inv_perm)]
+        return [z.permute(self.inv_perm(tuple(perm)))]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def inv_perm(perm):
+        inv = [0] * len(perm)
+        for i, p in enumerate(perm):
+            inv[p] = i
+        return tuple(inv)
 
 
 @operator_set.register("pad")
@@ -441,23 +605,19 @@ class Pad(ShapeOperator):
         assert (x.ndim * 2) % len(padding) == 0
         return (x,), dict(padding=padding, mode=mode, value=value)
 
+    def is_identity(self, x, *, padding, mode, value):
+        return not any(padding)
+
     def typecheck(self, x: SymbolicTensor, *, padding, mode, value) -> List[SymbolicTensor]:
         padding = padding[::-1]
         lo, hi = padding[0::2], padding[1::2]
-        interior = [0] * (len(padding) // 2)
-
-        def _dilate_dim(d, dilation):
-            return 0 if d == 0 else 1 + dilation * (d - 1)
-
-        shape = tuple(sum([l, h, _dilate_dim(d, r + 1)]) for l, h, r, d in list_zip(lo, hi, interior, x.shape))
+        shape = tuple(l + h + d for l, h, d in zip(lo, hi, x.shape))
         if not all(d >= 0 for d in shape):
             raise ValueError(
                 f"Dimension size after padding is not at least 0, "
-                f"got result shape {res}, for {lo=} {hi=} {interior=} {value=}"
-                f"{shape=}"
+                f"got result shape {shape}, for {lo=} {hi=} {value=}"
             )
-        res = SymbolicTensor(shape, x.dtype, x.device)
-        return [res]
+        return [SymbolicTensor.intern(shape, x.dtype, x.device)]
 
     def vmap(self, dim_size, vals_in, dims_in, *, padding, mode, value):
         (x,), (x_bdim,) = vals_in, dims_in
@@ -471,22 +631,8 @@ class Pad(ShapeOperator):
 
     def T(self, cotangents, x, *, padding, mode, value):
         (gL_y,) = cotangents
-        lo, hi = padding[0::2], padding[1::2]
-        interior = [0] * (len(padding) // 2)
-
-        unpadded = gL_y.slice(
-            lo,
-            tuple(s - h for s, h in list_zip(gL_y.shape, hi)),
-            tuple([1] * len(interior)),
-        )
-        gL_x = unpadded.slice(
-            tuple([0] * len(lo)),
-            unpadded.shape,
-            tuple(r + 1 for r in interior),
-        )
-        # else:
-        #     gL_x = NullCotangent()
-        return [gL_x]
+        # negative padding crops, so the transpose is the opposite padding in the same layout
+        return [gL_y.pad(tuple(-p for p in padding), mode, 0.0)]
 
 
 @operator_set.register("slice")
@@ -496,21 +642,22 @@ class Slice(ShapeOperator):
             strides = (1,) * len(starts)
         return (x,), dict(starts=starts, limits=limits, strides=strides)
 
+    def is_identity(self, x, *, starts, limits, strides):
+        return all(s == 0 for s in starts) and tuple(limits) == tuple(x.shape) and all(r == 1 for r in strides)
+
     def typecheck(self, x: SymbolicTensor, *, starts, limits, strides=None) -> List[SymbolicTensor]:
         if strides is None or tuple(strides) == (1,) * len(x.shape):
             shape = tuple([limit if type(start) is int and start == 0 else limit - start for start, limit in list_zip(starts, limits)])
-            return [SymbolicTensor(shape, x.dtype, x.device)]
+            return [SymbolicTensor.intern(shape, x.dtype, x.device)]
         else:
-            # TODO: compute strided shape without numpy
-            x = np.zeros(x.shape)
-            x = x[tuple(slice(s, l, r) for s, l, r in list_zip(starts, limits, strides))]
-            return [SymbolicTensor(x.shape, x.dtype, x.device)]
+            shape = tuple(len(range(*slice(s, l, r).indices(d))) for s, l, r, d in list_zip(starts, limits, strides, x.shape))
+            return [SymbolicTensor.intern(shape, x.dtype, x.device)]
 
     def vmap(self, dim_size, vals_in, dims_in, *, starts, limits, strides):
         (x,), (x_bdim,) = vals_in, dims_in
         x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
-        y = self((0,) + starts, (x.shape[0],) + limits, (1,) + strides)
-        return [y], [x_bdim]
+        y = self(x, starts=(0,) + tuple(starts), limits=(dim_size,) + tuple(limits), strides=(1,) + tuple(strides))
+        return [y], [0]
 
     def jvp(self, primals, tangents, *, starts, limits, strides=None):
         (x,), (x_dot,) = primals, tangents
@@ -518,37 +665,28 @@ class Slice(ShapeOperator):
 
     def T(self, cotangents, x, *, starts, limits, strides=None):
         (gL_y,) = cotangents
-        x_shape = x.symval.shape
         assert isinstance(x, UndefinedPrimal)
-        if strides is None or np.all(np.equal(strides, 1)):
-            lo, hi, interior = (
-                starts,
-                tuple(np.subtract(x.symval.shape, limits)),
-                (0,) * len(starts),
-            )
-        else:
-            real_limits = np.add(
-                starts,
-                tuple(
-                    np.where(
-                        np.array(x.shape) == 0,
-                        0,
-                        np.add(1, np.multiply(np.subtract(gL_y.shape, 1), strides)),
-                    )
-                ),
-            )
-            lo, hi, interior = list_zip(
-                starts,
-                np.subtract(x_shape, real_limits),
-                np.subtract(strides, 1),
-            )
-        padding = []
-        for l, h in zip(reversed(lo), reversed(hi)):
-            padding += [l, h]
-        padding = tuple(padding)
-        res = gL_y.pad(padding)
-        assert res.shape == x_shape, f"{res.shape=} {x_shape=}"
-        return [res]
+        gL_x = gL_y
+        for d, r in enumerate(strides or ()):
+            n = gL_x.shape[d]
+            if r == 1 or n == 0:
+                continue
+            # pad has no interior padding: put r - 1 zeros after each element on a new axis,
+            # merge it into d and drop the trailing zeros
+            lh = [0] * (2 * gL_x.ndim + 2)
+            lh[2 * d + 3] = r - 1
+            gL_x = gL_x.unsqueeze(d + 1).pad(tuple(lh[::-1]))
+            gL_x = gL_x.reshape(gL_x.shape[:d] + (n * r,) + gL_x.shape[d + 2 :])
+            gL_x = gL_x.slice((0,) * gL_x.ndim, gL_x.shape[:d] + ((n - 1) * r + 1,) + gL_x.shape[d + 1 :])
+        gL_x = gL_x.pad(self.T_padding(x.symval.shape, gL_x.shape, tuple(starts)))
+        assert gL_x.shape == x.symval.shape, f"{gL_x.shape=} {x.symval.shape=}"
+        return [gL_x]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def T_padding(x_shape, y_shape, starts):
+        # pad takes (lo, hi) pairs in dim order, flattened and reversed
+        return tuple(p for s, d, g in zip(starts, x_shape, y_shape) for p in (s, d - s - g))[::-1]
 
 
 @operator_set.register("flip")
@@ -564,8 +702,11 @@ class Flip(ShapeOperator):
             dim = tuple(dim)
         return (x,), dict(dim=dim)
 
+    def is_identity(self, x, *, dim):
+        return all(x.shape[d] == 1 for d in dim)
+
     def typecheck(self, x: SymbolicTensor, *, dim):
-        return [SymbolicTensor(tuple(x.shape), x.dtype, x.device)]
+        return [SymbolicTensor.intern(tuple(x.shape), x.dtype, x.device)]
 
     def vmap(self, dim_size, vals_in, dims_in, *, dim):
         (x,), (x_bdim,) = vals_in, dims_in
@@ -617,7 +758,7 @@ class Cat(ShapeOperator):
         concat_size = sum(x.shape[dim] for x in xs)
         ex_shape = xs[0].shape
         return [
-            SymbolicTensor(
+            SymbolicTensor.intern(
                 ex_shape[:dim] + (concat_size,) + ex_shape[dim + 1 :],
                 xs[0].dtype,
                 xs[0].device,
@@ -635,21 +776,22 @@ class Cat(ShapeOperator):
 
     def T(self, cotangents, *xs, dim=0):
         (gL_y,) = cotangents
-        x_shapes = [x.symval.shape if isinstance(x, UndefinedPrimal) else x.shape for x in xs]
-        limit_points = np.cumsum([shape[dim] for shape in x_shapes]).tolist()
-        starts = np.zeros((len(xs), gL_y.ndim), dtype=int).tolist()
-        limits = np.tile(gL_y.shape, (len(xs), 1)).tolist()
-
-        for i, s in enumerate(starts[1:]):
-            s[dim] = limit_points[:-1][i]
-        for i, l in enumerate(limits):
-            l[dim] = limit_points[i]
-
+        sizes = tuple((x.symval.shape if isinstance(x, UndefinedPrimal) else x.shape)[dim] for x in xs)
         return [
-            gL_y.slice(tuple(start), tuple(limit)) if isinstance(x, UndefinedPrimal) else NullCotangent
-            for x, start, limit in zip(xs, starts, limits)
+            gL_y.slice(start, limit) if isinstance(x, UndefinedPrimal) else NullCotangent
+            for x, (start, limit) in zip(xs, self.T_slices(sizes, dim, gL_y.shape))
         ]
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def T_slices(sizes, dim, y_shape):
+        slices, offset = [], 0
+        for size in sizes:
+            start = (0,) * dim + (offset,) + (0,) * (len(y_shape) - dim - 1)
+            offset += size
+            slices += [(start, y_shape[:dim] + (offset,) + y_shape[dim + 1 :])]
+        return tuple(slices)
+
 
 # -----------------------
 # InitOps
@@ -674,7 +816,7 @@ class Full(InitOperator):
         return (), dict(shape=shape, fill_value=fill_value, dtype=dtype, device=device)
 
     def typecheck(self, *, shape, fill_value, dtype, device) -> List[SymbolicTensor]:
-        return [SymbolicTensor(tuple(shape), dtype, device)]
+        return [SymbolicTensor.intern(tuple(shape), dtype, device)]
 
 
 @operator_set.register("random_uniform", variadic_inputs=True, aliases=["rand"])
@@ -700,7 +842,7 @@ class RandomUniform(InitOperator):
         return (), dict(shape=shape, dtype=dtype, device=device)
 
     def typecheck(self, *, shape, dtype, device) -> List[SymbolicTensor]:
-        return [SymbolicTensor(tuple(shape), dtype, device)]
+        return [SymbolicTensor.intern(tuple(shape), dtype, device)]
 
 
 @operator_set.register("random_normal", variadic_inputs=True, aliases=["randn"])
@@ -726,7 +868,7 @@ class RandomNormal(InitOperator):
         return (), dict(shape=shape, dtype=dtype, device=device)
 
     def typecheck(self, *, shape, dtype, device) -> List[SymbolicTensor]:
-        return [SymbolicTensor(tuple(shape), dtype, device)]
+        return [SymbolicTensor.intern(tuple(shape), dtype, device)]
 
 
 @operator_set.register("arange", aliases=["iota"])
@@ -753,7 +895,7 @@ class Arange(InitOperator):
             assert stop > start
         else:
             assert stop < start
-        return [SymbolicTensor((int(math.ceil((abs(stop - start) / abs(stride)))),), dtype, device)]
+        return [SymbolicTensor.intern((int(math.ceil((abs(stop - start) / abs(stride)))),), dtype, device)]
 
 
 # -------------------
@@ -785,6 +927,9 @@ class Matmul(GeneralReduceOperator):
             elif w.ndim == 1:
                 assert x.shape[-1] == w.shape[0], f"{shapes_str}"
                 shape = x.shape[:-1]
+            elif w.ndim == 2:  # batch-leading x against one shared matrix is a single GEMM
+                assert x.shape[-1] == w.shape[0], f"{shapes_str}"
+                shape = (*x.shape[:-1], w.shape[1])
             else:
                 assert x.shape[-1] == w.shape[-2], f"{shapes_str}"
                 assert len(x.shape) == len(w.shape), f"Different ndim broadcasting not supported, {shapes_str}"
@@ -797,13 +942,24 @@ class Matmul(GeneralReduceOperator):
                 # shape = (*bdim_shape, x.shape[-2], w.shape[-1])
         else:
             raise ValueError(f"Invalid dimensions for matmul, {shapes_str}")
-        return [SymbolicTensor(shape, x.dtype, x.device)]
+        return [SymbolicTensor.intern(shape, x.dtype, x.device)]
 
     def vmap(self, dim_size, vals_in, dims_in, **params):
         (x, w), (x_bdim, w_bdim) = vals_in, dims_in
         x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
+        if w_bdim is None and w.ndim == 2:
+            return [self(x, w)], [0]
         w = slope.core.VMapTrace.move_vmap_dim(w, dim_size, w_bdim, 0)
-        return [self(x, w, **params)], [x_bdim, w_bdim]
+        # per-example vectors become 1-row/1-column matrices of a batched matmul
+        x_vec, w_vec = x.ndim == 2, w.ndim == 2
+        if x_vec:
+            x = x.reshape((x.shape[0], 1, x.shape[1]))
+        if w_vec:
+            w = w.reshape((*w.shape, 1))
+        y = self(x, w)
+        if x_vec or w_vec:
+            y = y.reshape((*y.shape[:-2], *(() if x_vec else y.shape[-2:-1]), *(() if w_vec else y.shape[-1:])))
+        return [y], [0]
 
     def jvp(self, primals, tangents):
         (x, w), (x_dot, w_dot) = primals, tangents
@@ -815,6 +971,8 @@ class Matmul(GeneralReduceOperator):
         if type(x) is UndefinedPrimal:
             return [gL_y @ w.transpose(-1, -2), NullCotangent]
         elif type(w) is UndefinedPrimal:
+            if x.ndim > 2 and w.symval.ndim == 2:  # the shared matrix sums over all batch dims
+                x, gL_y = x.reshape((-1, x.shape[-1])), gL_y.reshape((-1, gL_y.shape[-1]))
             return [NullCotangent, x.transpose(-1, -2) @ gL_y]
 
 
@@ -831,24 +989,22 @@ class Conv(GeneralReduceOperator):
             if isinstance(padding, int)
             else (padding if len(padding) == 2 * len(D) else [p for p in padding for _ in range(2)])
         )
-        if isinstance(stride, int):
-            stride = (stride,) * len(D)
-        if isinstance(dilation, int):
-            dilation = (dilation,) * len(D)
+        stride = (stride,) * len(D) if isinstance(stride, int) else tuple(stride)
+        dilation = (dilation,) * len(D) if isinstance(dilation, int) else tuple(dilation)
         assert len(D) == len(stride) and len(D) == len(dilation), f"{len(D)=} {len(stride)=} {len(D)=} {len(dilation)=}"
         return (x, w), dict(groups=groups, stride=stride, dilation=dilation, padding=padding)
 
     def typecheck(self, x, w, *, groups, stride, dilation, padding):
         assert x.dtype == w.dtype
-        s_dims = []
-        ps, pe = padding[0::2], padding[1::2]
-        for i, s in enumerate(x.shape[2:]):
-            out_s = ((s + ps[i] + pe[i] - dilation[i] * (w.shape[i + 2] - 1) - 1) // stride[i]) + 1
-            s_dims += [out_s]
-        bsz = x.shape[0]
-        yc = w.shape[0]  # if x.ndim == w.ndim else 1]
-        out_shape = (bsz, yc // groups, *tuple(s_dims))
-        return [SymbolicTensor(out_shape, x.dtype, x.device)]
+        return [SymbolicTensor.intern(self.out_shape(x.shape, w.shape, groups, stride, dilation, padding), x.dtype, x.device)]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def out_shape(x_shape, w_shape, groups, stride, dilation, padding):
+        return (x_shape[0], w_shape[0] // groups) + tuple(
+            (s + lo + hi - d * (k - 1) - 1) // r + 1
+            for s, k, lo, hi, r, d in zip(x_shape[2:], w_shape[2:], padding[0::2], padding[1::2], stride, dilation)
+        )
 
     def vmap(self, dim_size, vals_in, dims_in, **params):
         (x, w), (x_bdim, _) = vals_in, dims_in
@@ -880,6 +1036,17 @@ class Conv(GeneralReduceOperator):
 
         return [y], [y_dot1 + y_dot2]
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def T_w_padding(x_T_shape, gL_y_T_shape, w_shape, groups, stride, dilation, padding):
+        # the weight grad conv overshoots w on the hi side; trim its hi padding rather than slicing the result
+        out_shape = Conv.out_shape(x_T_shape, gL_y_T_shape, groups, dilation, stride, padding)
+        his = tuple(
+            hi - (o - k) * d if hi >= (o - k) * d else hi
+            for hi, o, k, d in zip(padding[1::2], out_shape[2:], w_shape[2:], dilation)
+        )
+        return tuple(p for lo, hi in zip(padding[0::2], his) for p in (lo, hi))
+
     # https://deeplearning.cs.cmu.edu/F21/document/recitation/Recitation5/CNN_Backprop_Recitation_5_F21.pdf
     # x_grad = F.conv_transpose2d(y.grad, w, stride=stride, padding=padding, dilation=dilation, output_padding=stride-padding)
     # assert torch.allclose(x_grad, x.grad)
@@ -901,17 +1068,14 @@ class Conv(GeneralReduceOperator):
             assert gL_x.shape == x.shape
             return [gL_x, NullCotangent]
         elif type(w) is UndefinedPrimal:
-            gL_w = (
-                x.transpose(0, 1)
-                .conv(
-                    gL_y.transpose(0, 1),
-                    groups=groups,
-                    stride=dilation,
-                    dilation=stride,
-                    padding=padding,
-                )
-                .transpose(0, 1)
-            )
+            x_T, gL_y_T = x.transpose(0, 1), gL_y.transpose(0, 1)
+            gL_w = x_T.conv(
+                gL_y_T,
+                groups=groups,
+                stride=dilation,
+                dilation=stride,
+                padding=self.T_w_padding(x_T.shape, gL_y_T.shape, w.shape, groups, stride, dilation, padding),
+            ).transpose(0, 1)
             if gL_w.shape != w.shape:
                 starts = (0,) * len(gL_w.shape)
                 ends = (gL_w.shape[0], gL_w.shape[1]) + w.shape[2:]
@@ -920,34 +1084,53 @@ class Conv(GeneralReduceOperator):
             return [NullCotangent, gL_w]
 
 
-# @operator_set.register("where")
-# class Where(GeneralReduceOperator):
-#     def args_fixer(self, x, w, u):
-#         return (x, w, u), dict()
+@operator_set.register("where")
+class Where(GeneralReduceOperator):
+    def args_fixer(self, x, w, u):
+        if any(type(a) is UndefinedPrimal for a in (x, w, u)):
+            return (x, w, u), dict()
+        if type(w) in TraceTensor.PYTHON_TYPES and type(u) in TraceTensor.PYTHON_TYPES:
+            w = slope.full((), w, device=x.device)
+        if type(w) in TraceTensor.PYTHON_TYPES:
+            w = slope.full((), w, dtype=u.dtype, device=u.device)
+        elif type(u) in TraceTensor.PYTHON_TYPES:
+            u = slope.full((), u, dtype=w.dtype, device=w.device)
+        if x.dtype is not dtypes.bool:
+            x = x != x.zeros_like()
+        if w.dtype is not u.dtype:
+            if dtypes.is_float(u.dtype) and not dtypes.is_float(w.dtype):
+                w = w.cast(u.dtype)
+            else:
+                u = u.cast(w.dtype)
+        x, w, u = slope.core.broadcast_tensors(x, w, u)
+        return (x, w, u), dict()
 
-#     def typecheck(self, x, w, u):
-#         return [w]
+    def typecheck(self, x, w, u):
+        if x.dtype is not dtypes.bool:
+            raise TypeError(f"x.dtype ({x.dtype}) is not bool")
+        if w.dtype != u.dtype:
+            raise TypeError(f"w.dtype ({w.dtype}) != u.dtype ({u.dtype})")
+        if not (x.shape == w.shape == u.shape):
+            raise TypeError(f"shapes mismatch {x.shape}, {w.shape}, {u.shape}")
+        return [SymbolicTensor.like(w)]
 
-#     def vmap(self, dim_size, vals_in, dims_in, **params):
-#         (x, w, u), (x_bdim, w_bdim, u_bdim) = vals_in, dims_in
-#         x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
-#         w = slope.core.VMapTrace.move_vmap_dim(w, dim_size, w_bdim, 0)
-#         u = slope.core.VMapTrace.move_vmap_dim(w, dim_size, w_bdim, 0)
-#         return [self(x, w, u)], [x_bdim, w_bdim, u_bdim]
+    def vmap(self, dim_size, vals_in, dims_in, **params):
+        (x, w, u), (x_bdim, w_bdim, u_bdim) = vals_in, dims_in
+        x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
+        w = slope.core.VMapTrace.move_vmap_dim(w, dim_size, w_bdim, 0)
+        u = slope.core.VMapTrace.move_vmap_dim(u, dim_size, u_bdim, 0)
+        return [self(x, w, u)], [0]
 
-#     def jvp(self, primals, tangents):
-#         (x, w, u), (x_dot, w_dot, u_dot) = primals, tangents
-#         return [self(x, w, u)], [self(x_dot, w_dot, u_dot)]
+    def jvp(self, primals, tangents):
+        (x, w, u), (_, w_dot, u_dot) = primals, tangents
+        return [self(x, w, u)], [self(x, w_dot, u_dot)]
 
-#     def T(self, cotangents, x, w, u):
-#         assert (type(x) is UndefinedPrimal) ^ (type(w) is UndefinedPrimal) ^ (type(u) is UndefinedPrimal)
-#         (gL_y,) = cotangents
-#         if type(x) is UndefinedPrimal:
-#             return [None, None, None]
-#         elif type(w) is UndefinedPrimal:
-#             return [None, self(x, gL_y, gL_y.zeros_like()), None]
-#         elif type(u) is UndefinedPrimal:
-#             return [None, None, self(x, gL_y.zeros_like(), gL_y)]
+    def T(self, cotangents, x, w, u):
+        assert type(x) is not UndefinedPrimal
+        (gL_y,) = cotangents
+        gL_w = self(x, gL_y, gL_y.zeros_like()) if type(w) is UndefinedPrimal else NullCotangent
+        gL_u = self(x, gL_y.zeros_like(), gL_y) if type(u) is UndefinedPrimal else NullCotangent
+        return [NullCotangent, gL_w, gL_u]
 
 
 @operator_set.register("gather_nd")
@@ -965,16 +1148,18 @@ class GatherND(GeneralReduceOperator):
         assert 1 <= w.shape[-1] <= r
         assert w.shape[-1] <= r
         assert b < min(x.ndim, w.ndim)
-        bx = x.shape[b:]
-        bw = w.shape[b:]
-        shape = bx[:b] + bw[: len(bw) - 1] + bx[bw[-1] :]
+        shape = x.shape[:b] + w.shape[b:-1] + x.shape[b + w.shape[-1] :]
         return [x.symval.like(shape=shape)]
 
-    def vmap(self, dim_size, vals_in, dims_in, **params):
+    def vmap(self, dim_size, vals_in, dims_in, *, batch_dims):
         (x, w), (x_bdim, w_bdim) = vals_in, dims_in
-        x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
         w = slope.core.VMapTrace.move_vmap_dim(w, dim_size, w_bdim, 0)
-        return [self(x, w, **params)], [x_bdim, w_bdim]
+        if x_bdim is None and batch_dims == 0:
+            # the vmapped dim is just one more index batch dim of w
+            return [self(x, w, batch_dims=0)], [0]
+        # the vmapped dim becomes a leading batch dim, so no batch iota is concatenated into w
+        x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
+        return [self(x, w, batch_dims=batch_dims + 1)], [0]
 
     def jvp(self, primals, tangents, *, batch_dims):
         (x, w), (x_dot, _) = primals, tangents
@@ -1010,23 +1195,24 @@ class ScatterND(GeneralReduceOperator):
         (x, w, u), (x_bdim, w_bdim, u_bdim) = vals_in, dims_in
         x = slope.core.VMapTrace.move_vmap_dim(x, dim_size, x_bdim, 0)
         w = slope.core.VMapTrace.move_vmap_dim(w, dim_size, w_bdim, 0)
-        u = slope.core.VMapTrace.move_vmap_dim(w, dim_size, u_bdim, 0)
-        return [self(x, w, u, **params)], [x_bdim, w_bdim, u_bdim]
+        u = slope.core.VMapTrace.move_vmap_dim(u, dim_size, u_bdim, 0)
+        # prefix each index tuple with its batch position; the iota is a broadcast view until the cat
+        counts = slope.arange(dim_size, dtype=w.dtype, device=w.device)
+        counts = counts.reshape((dim_size,) + (1,) * (w.ndim - 1)).expand(w.shape[:-1] + (1,))
+        w = counts.cat(w, dim=w.ndim - 1)
+        return [self(x, w, u, **params)], [0]
 
     def jvp(self, primals, tangents):
-        (x, w, u), (x_dot, w_dot, u_dot) = primals, tangents
-        return [self(x, w, u)], [self(x_dot, w_dot, u_dot)]
+        (x, w, u), (x_dot, _, u_dot) = primals, tangents
+        return [self(x, w, u)], [self(x_dot, w, u_dot)]
 
     def T(self, cotangents, x, w, u):
-        assert (type(x) is UndefinedPrimal) ^ (type(w) is UndefinedPrimal) ^ (type(u) is UndefinedPrimal)
+        assert type(w) is not UndefinedPrimal
         (gL_y,) = cotangents
-        if type(u) is UndefinedPrimal:
-            return [gL_y, NullCotangent, NullCotangent]
-            # return [self(x.zeros_like(), w, gL_y), w.zeros_like(), None]
-        elif type(w) is UndefinedPrimal:
-            return [gL_y, NullCotangent, NullCotangent]
-        else:
-            return [NullCotangent, NullCotangent, NullCotangent]
+        # scatter_nd adds u into x, so x gets gL_y and u gets it gathered back at the same indices
+        gL_x = gL_y if type(x) is UndefinedPrimal else NullCotangent
+        gL_u = gL_y.gather_nd(w) if type(u) is UndefinedPrimal else NullCotangent
+        return [gL_x, NullCotangent, gL_u]
 
 
 # @operator_set.register("rng_bits")
@@ -2,9 +2,9 @@ import slope
 from slope.core import ProcedureSet, Tensor, dtypes
 import math
 import numpy as np
-from typing import Tuple, List, Dict, Any, Optional, Sequence, Union, Iterator, NamedTuple, DefaultDict
-from collections import defaultdict
+from typing import Tuple, List, Dict, Any, Optional, Sequence, Union, Iterator, NamedTuple
 import functools
+import itertools
 
 max_ = max
 abs_ = abs
@@ -13,6 +13,12 @@ sum_ = sum
 procedure_set = ProcedureSet()
 
 
+@functools.lru_cache(maxsize=256)
+def _cached_arange(n, dtype, device):
+    # built from numpy, so it stays a concrete tensor even when first requested under a trace
+    return slope.tensor(np.arange(n), dtype=dtype, device=device)
+
+
 @procedure_set.register()
 def zeros(*args, **kwargs):
     dtype = kwargs.get("dtype", slope.core.backend.DEFAULT_DTYPE)
@@ -81,7 +87,8 @@ def where(x, trueval, falseval):
 @procedure_set.register()
 def mean(x, dim=None, keepdim=False):
     out = x.sum(dim=dim, keepdim=keepdim)
-    return out * (math.prod(out.shape) / math.prod(x.shape))
+    n, n_out = math.prod(x.shape), math.prod(out.shape)
+    return out if n == n_out else out * (n_out / n)
 
 
 @procedure_set.register()
@@ -121,7 +128,7 @@ def less_equal(x, w):
 
 @procedure_set.register()
 def minimum(x, w):
-    return -x.maximum(-x, -w)
+    return -((-x).maximum(-w))
 
 
 @procedure_set.register()
@@ -136,10 +143,10 @@ def argmax(x, dim=None, keepdim=False):
         ar = ar.reshape(x.shape)
         idx = (x == x.max(dim)).cast(x.dtype) * ar
         return math.prod(x.shape) - idx.max().cast(slope.int32) - 1
+    (dim,) = (dim,) if type(dim) is int else dim
     dim = dim + len(x.shape) if dim < 0 else dim
     m = (x == x.max(dim=dim, keepdim=True)).cast(x.dtype)
-    idx = m * slope.arange(x.shape[dim] - 1, -1, -1, dtype=x.dtype)
-    # idx = idx.reshape(x.shape[dim], *[1] * (x.ndim - dim - 1))
+    idx = m * slope.arange(x.shape[dim] - 1, -1, -1, dtype=x.dtype).reshape(x.shape[dim], *[1] * (x.ndim - dim - 1))
     ret = x.shape[dim] - idx.max(dim=dim, keepdim=keepdim) - 1
     return ret.cast(slope.int32)
 
@@ -151,23 +158,24 @@ def argmin(x, dim=None, keepdim=False):
 
 @procedure_set.register()
 def log2(x):
-    return x.log() / math.log(2)
+    return x.log() * (1 / math.log(2))
 
 
 @procedure_set.register()
 @staticmethod
 def _tri(r: int, c: int, k: int = 0, **kwargs) -> Tensor:
-    return slope.arange(r, **kwargs).unsqueeze(1).expand(r, c) <= slope.arange(-k, c - k, **kwargs).unsqueeze(0).expand(r, c)
+    # (r, 1) <= (1, c) broadcasts in the compare, so only the bool mask is r x c
+    return slope.arange(r, **kwargs).unsqueeze(1) <= slope.arange(-k, c - k, **kwargs).unsqueeze(0)
 
 
 @procedure_set.register()
 def triu(x, k: int = 0) -> Tensor:
-    return _tri(x.shape[-2], x.shape[-1], k=k, dtype=x.dtype, device=x.device).where(x, slope.zeros_like(x))
+    return _tri(x.shape[-2], x.shape[-1], k=k, dtype=slope.int32, device=x.device).where(x, 0.0)
 
 
 @procedure_set.register()
 def tril(x, k: int = 0) -> Tensor:
-    return _tri(x.shape[-2], x.shape[-1], k=k + 1, dtype=x.dtype, device=x.device).where(slope.zeros_like(x), x)
+    return _tri(x.shape[-2], x.shape[-1], k=k + 1, dtype=slope.int32, device=x.device).where(0.0, x)
 
 
 @procedure_set.register()
@@ -217,109 +225,137 @@ def matmul(x, w):
     return (x * w).sum(-1).reshape((*x.shape[0:-2], -1))
 
 
+@functools.lru_cache(maxsize=1024)
+def _getitem_plan(shape, key):
+    # everything but the tensor indices is static, so the movement ops of x[key] are planned once per (shape, key)
+    # key holds ints, (start, stop, step) for slices, None, Ellipsis and Tensor in place of tensor indices
+    ellipsis_idx = [dim for dim, i in enumerate(key) if i is Ellipsis]
+    if len(ellipsis_idx) > 1:
+        raise IndexError("indices can only have a single ellipsis ('...')")
+    num_indices = len(key) - len(ellipsis_idx) - sum_(1 for i in key if i is None)
+    if num_indices > len(shape):
+        raise IndexError(f"too many {num_indices=} for ndim={len(shape)}")
+    fill_idx = ellipsis_idx[0] if ellipsis_idx else len(key)
+    key = key[:fill_idx] + ((None, None, None),) * (len(shape) - num_indices) + key[fill_idx + 1 :]
+
+    # record None for dimension injection later and filter None
+    none_dims = [dim for dim, i in enumerate(key) if i is None]
+    key_filtered = [i for i in key if i is not None]
+
+    # every dim becomes one (start, limit, step) of a single strided slice, negative steps also flip the dim
+    starts, limits, strides, flip_dims, int_dims, tensor_dims = [], [], [], [], [], []
+    for dim, (index, size) in enumerate(zip(key_filtered, shape)):
+        if isinstance(index, int):
+            if index >= size or index < -size:
+                raise IndexError(f"{index=} is out of bounds on {dim=} with {size=}")
+            index = index if index >= 0 else size + index
+            start, limit, step = index, index + 1, 1
+            int_dims.append(dim)
+        elif isinstance(index, tuple):
+            if index[2] == 0:
+                raise ValueError(f"index={slice(*index)} on {dim=} cannot have 0 as step")
+            start, limit, step = slice(*index).indices(size)
+            if (count := len(range(start, limit, step))) == 0:
+                start, limit, step = 0, 0, 1
+            elif step < 0:  # the same elements in increasing order, flipped back after the slice
+                start, limit, step = start + step * (count - 1), start + 1, -step
+                flip_dims.append(dim)
+        else:  # tensor dims are kept whole for advanced indexing
+            start, limit, step = 0, size, 1
+            tensor_dims.append(dim)
+        starts.append(start)
+        limits.append(limit)
+        strides.append(step)
+    sliced_shape = tuple(len(range(start, limit, step)) for start, limit, step in zip(starts, limits, strides))
+
+    # inject 1 for dim where it's None and collapse dim for int
+    # labels track where each dim of x ends up
+    new_shape, labels = list(sliced_shape), list(range(len(sliced_shape)))
+    for dim in none_dims:
+        new_shape.insert(dim, 1)
+        labels.insert(dim, None)
+    for dim in tuple(dim + sum_(1 for d in none_dims if dim >= d) for dim in reversed(int_dims)):
+        new_shape.pop(dim)
+        labels.pop(dim)
+
+    # tensor indexed dims go first for gather_nd, like numpy they move back in place if all advanced indices,
+    # which with a tensor index present include the ints, were adjacent; in place means after the dims of the
+    # slices and Nones before the first advanced index, as every int then comes at or after it
+    dims = [labels.index(dim) for dim in tensor_dims]
+    perm = (*dims, *(d for d in range(len(new_shape)) if d not in dims))
+    advanced = [pos for pos, i in enumerate(key) if isinstance(i, int) or i is Tensor]
+    adjacent_dim = advanced[0] if dims and advanced == list(range(advanced[0], advanced[-1] + 1)) else None
+    return tuple(starts), tuple(limits), tuple(strides), tuple(flip_dims), tuple(new_shape), perm, adjacent_dim
+
+
 @procedure_set.register()
 def getitem(x, indices) -> Tensor:
-    # 1. indices normalization and validation
     # treat internal tuples and lists as Tensors and standardize indices to list type
     if isinstance(indices, list) and all(isinstance(s, int) for s in indices):
+        indices = [slope.tensor(indices, dtype=slope.backend.dtype_for_indices, device=x.device)]
+    elif isinstance(indices, (tuple, list)):
         indices = [
-            slope.tensor(
-                indices,
-                x.device,
-            )
+            slope.tensor(list(i), dtype=slope.backend.dtype_for_indices, device=x.device) if isinstance(i, (tuple, list)) else i
+            for i in indices
         ]
-    elif isinstance(indices, (tuple, list)):
-        indices = [slope.tensor(list(i), x.device) if isinstance(i, (tuple, list)) else i for i in indices]
     else:
         indices = [indices]
 
-    # filter ellipsis and fill with slice(None) or fill rest of indices with slice(None)
-    ellipsis_idx = [dim for dim, i in enumerate(indices) if i is Ellipsis]
-    fill_idx = ellipsis_idx[0] if ellipsis_idx else len(indices)
-    num_indices = len(indices) - len(ellipsis_idx) - sum(1 for i in indices if i is None)
-    indices[fill_idx : fill_idx + 1] = [slice(None)] * (len(x.shape) - num_indices)
-
-    # use Dict[type, List[dimension]] to track elements in indices
-    type_dim: DefaultDict[Union[type, None], List[int]] = defaultdict(list)
-
-    # record None for dimension injection later and filter None and record rest of indices
-    type_dim[None] = [dim for dim, i in enumerate(indices) if i is None]
-    indices_filtered = [v for v in indices if v is not None]
-    for dim, i in enumerate(indices_filtered):
-        type_dim[type(i)].append(dim)
-
-    for index_type in type_dim:
-        if index_type not in [None, int, slice, Tensor]:
-            raise IndexError(f"{index_type=} not supported")
-    if len(ellipsis_idx) > 1:
-        raise IndexError("indices can only have a single ellipsis ('...')")
-    if num_indices > x.ndim:
-        raise IndexError(f"too many {num_indices=} for {x.ndim=}")
-
-    # 2. basic indexing, uses only movement ops (no copy)
-    # currently indices_filtered: Tuple[Union[slice, int, Tensor], ...]
-    # turn indices in indices_filtered to Tuple[shrink_arg, strides]
-    for dim in type_dim[int]:
-        if (index := indices_filtered[dim]) >= (size := x.shape[dim]) or index < -size:
-            raise IndexError(f"{index=} is out of bounds on {dim=} with {size=}")
-        indices_filtered[dim] = ((index, index + 1), 1) if index >= 0 else ((size + index, size + index + 1), 1)
-    for dim in type_dim[slice]:
-        if (index := indices_filtered[dim]).step == 0:
-            raise ValueError(f"{index=} on {dim=} cannot have 0 as step")
-        s, e, st = index.indices(x.shape[dim])
-        indices_filtered[dim] = ((0, 0) if (st * (e - s)) < 0 else (s, e) if st > 0 else (e + 1, s + 1), st)
-    # record tensors and skip all Tensor dims for basic indexing
-    tensor_index: List[Tensor] = []
-    for dim in type_dim[Tensor]:
-        tensor_index.append(index := indices_filtered[dim])
-        if not dtypes.is_int(index.dtype):
-            raise IndexError(f"{index.dtype=} on {dim=} is not supported, only int tensor indexing is supported")
-        indices_filtered[dim] = ((0, x.shape[dim]), 1)
-
-    new_slice, strides = ((), ()) if not indices_filtered else zip(*indices_filtered)
-    ret = x.padslice(new_slice).flip(tuple(i for i, s in enumerate(strides) if s < 0))
-    if any(abs_(s) != 1 for s in strides):
-        strides = tuple(abs_(s) for s in strides)
-        round_up = lambda num, amt: (num + amt - 1) // amt * amt
-        ret = ret.pad(tuple((0, round_up(sh, s) - sh) for s, sh in zip(strides, ret.shape)))
-        ret = ret.reshape(tuple(flatten((sh // s, s) for s, sh in zip(strides, ret.shape))))
-        ret = ret.padslice(tuple(flatten(((0, sh), (0, 1)) for sh in ret.shape[::2]))).reshape(ret.shape[::2])
-
-    # inject 1 for dim where it's None and collapse dim for int
-    new_shape = list(ret.shape)
-    for dim in type_dim[None]:
-        new_shape.insert(dim, 1)
-    for dim in (
-        tuple(dim + sum_(1 for d in type_dim[None] if dim >= d) for dim in reversed(type_dim[int]))
-        # dims_collapsed := tuple(dim + sum_(1 for d in type_dim[None] if dim >= d) for dim in reversed(type_dim[int]))
-    ):
-        new_shape.pop(dim)
-
+    key, tensor_index = [], []
+    for i in indices:
+        if isinstance(i, slice):
+            key.append((i.start, i.stop, i.step))
+        elif isinstance(i, Tensor):  # also traced tensors, whose type is a Tensor subclass
+            if not dtypes.is_int(i.dtype):
+                raise IndexError(f"{i.dtype=} is not supported, only int tensor indexing is supported")
+            key.append(Tensor)
+            tensor_index.append(i)
+        elif isinstance(i, int) or i is None or i is Ellipsis:
+            key.append(i)
+        else:
+            raise IndexError(f"index_type={type(i)} not supported")
+    starts, limits, strides, flip_dims, new_shape, perm, adjacent_dim = _getitem_plan(tuple(x.shape), tuple(key))
+
+    # basic indexing, uses only movement ops (no copy)
+    ret = x.slice(starts, limits, strides)
+    if flip_dims:
+        ret = ret.flip(flip_dims)
     ret = ret.reshape(new_shape)
 
-    # 3. advanced indexing (copy)
-    if type_dim[Tensor]:
-        for i in tensor_index:
-            while i.ndim < ret.ndim:
-                i = i[None]
-            ret = ret.gather_nd(i)
+    # advanced indexing (copy), all tensor indices are broadcast together and read with one gather_nd
+    if tensor_index:
+        ret = ret.permute(*perm)
+        tensor_index = slope.core.broadcast_tensors(*tensor_index)
+        batch_ndim = tensor_index[0].ndim
+        if 0 in ret.shape:  # nothing to read from an empty slice, the result is as empty with the gathered shape
+            ret = slope.full((*tensor_index[0].shape, *ret.shape[len(tensor_index) :]), 0, dtype=x.dtype, device=x.device)
+        else:
+            tensor_index = [i.expand_dims(-1) for i in tensor_index]
+            ret = ret.gather_nd(tensor_index[0].cat(*tensor_index[1:], dim=batch_ndim) if len(tensor_index) > 1 else tensor_index[0])
+        if adjacent_dim is not None:
+            ret = ret.permute(*range(batch_ndim, batch_ndim + adjacent_dim), *range(batch_ndim), *range(batch_ndim + adjacent_dim, ret.ndim))
     return ret
 
 
+@functools.lru_cache(maxsize=1024)
+def _padslice_plan(shape, arg):
+    # some dim are pad, some are sliced
+    arg_ = tuple(a if a is not None else (0, s) for s, a in zip(shape, arg))
+    padding = tuple((max_(0, -lo), max_(0, hi - s)) for (lo, hi), s in zip(arg_, shape))
+    pad_arg = tuple(itertools.chain.from_iterable(padding))[::-1] if any(lo or hi for lo, hi in padding) else None
+    starts = tuple(lo + p for (lo, _), (p, _) in zip(arg_, padding))
+    limits = tuple(hi + p for (_, hi), (p, _) in zip(arg_, padding))
+    return pad_arg, starts, limits
+
+
 @procedure_set.register()
 def padslice(x, arg: Sequence[Optional[Tuple[int, int]]], value: float = 0):
-    def flatten_seq(l: Iterator):
-        return tuple(item for sublist in l for item in sublist)
-
-    # some dim are pad, some are sliced
-    arg_ = tuple([a if a is not None else (0, s) for s, a in zip(x.shape, arg)])
-    padding = tuple([(max(0, -p[0]), max(0, p[1] - x.shape[i])) for i, p in enumerate(arg_)])
-    if len(padding) == 0:
-        breakpoint()
-    x = x.pad(flatten_seq(padding)[::-1], value=value)  # flatten
-    starts, limits, strides = tuple(zip(*[(p[0] + padding[i][0], p[1] + padding[i][0], 1) for i, p in enumerate(arg_)]))
-    x = x.slice(starts, limits, strides)
-    return x
+    if x.ndim == 0 or len(arg) == 0:
+        return x
+    pad_arg, starts, limits = _padslice_plan(tuple(x.shape), tuple(a if a is None else tuple(a) for a in arg))
+    if pad_arg is not None:
+        x = x.pad(pad_arg, value=value)
+    return x.slice(starts, limits)
 
 
 @procedure_set.register()
@@ -331,38 +367,20 @@ def pad2d(x, padding: Union[List[int], Tuple[int, ...]], value: float = 0):
 
 @procedure_set.register()
 def gather_nd(x, w, batch_dims=0):
-    def gather(x, w, dim: int):
-        assert w.ndim == x.ndim, "x.ndim must equal w.ndim"
-        assert all(s >= i for s, i in zip(x.shape, w.shape)), "all dim of idx.shape must be smaller than x.shape"
-        if dim < 0:
-            dim += x.ndim
-        w = w.transpose(ax=dim, aw=0).expand_dims(-1)
-        permarg = list(range(x.ndim))
-        permarg = permarg[1:dim] + [permarg[0]] + permarg[dim + 1 :] + [permarg[dim]] if dim != 0 else permarg[1:] + [permarg[0]]
-        return (
-            (
-                (
-                    w
-                    == slope.arange(
-                        x.shape[dim],
-                        dtype=w.dtype,
-                        device=w.device,
-                    )
-                ).cast(x.dtype)
-                * x.permute(*permarg).padslice(tuple([*[(0, sh) for sh in w.shape[1:-1]], (0, x.shape[dim])])).expand_dims(0)
-            )
-            .sum(-1)
-            .transpose(ax=0, aw=dim)
-        )
-
-    def _gather_nd_single(x_, w_):
-        return gather(x_, w_.transpose(-1, 0), 0)
-
+    # one mask over the k indexed dims of x, the product of the k per-dim one-hot compares,
+    # contracted with x by a single matmul that reads every index at once instead of one masked sum per dim
     assert batch_dims == 0
-    gather_nd_ = (
-        functools.reduce(lambda g, f: f(g), [slope.vmap] * int(batch_dims), _gather_nd_single) if batch_dims > 0 else _gather_nd_single
-    )
-    return gather_nd_(x, w)
+    k = w.shape[-1]
+    batch_shape, index_shape, rest_shape = w.shape[:-1], x.shape[:k], x.shape[k:]
+    b_ones, k_ones = [1] * len(batch_shape), [1] * k
+    mask = None
+    for dim, size in enumerate(index_shape):
+        arange_shape = (*b_ones, *k_ones[:dim], size, *k_ones[dim + 1 :])
+        one_hot = w[..., dim].reshape(*batch_shape, *k_ones) == slope.arange(size, dtype=w.dtype, device=w.device).reshape(*arange_shape)
+        mask = one_hot.cast(x.dtype) if mask is None else mask * one_hot.cast(x.dtype)
+    index_numel, rest_numel = math.prod(index_shape), math.prod(rest_shape)
+    ret = mask.reshape(math.prod(batch_shape), index_numel) @ x.reshape(index_numel, rest_numel)
+    return ret.reshape(*batch_shape, *rest_shape)
 
 
 @procedure_set.register()
@@ -380,9 +398,14 @@ def stack(tensors, dim=0):
 
 @procedure_set.register()
 def repeat(x, repeats):
+    return x.tile(repeats)
+
+
+@procedure_set.register()
+def tile(x, repeats):
     base_shape = (1,) * (len(repeats) - x.ndim) + x.shape
-    new_shape = [x for b in base_shape for x in [1, b]]
-    expand_shape = [x for rs in zip(repeats, base_shape) for x in rs]
+    new_shape = list(itertools.chain.from_iterable((1, b) for b in base_shape))
+    expand_shape = list(itertools.chain.from_iterable(zip(repeats, base_shape)))
     final_shape = [r * s for r, s in zip(repeats, base_shape)]
     return x.reshape(new_shape).expand(expand_shape).reshape(final_shape)
 
@@ -390,8 +413,11 @@ def repeat(x, repeats):
 @procedure_set.register()
 def split(x, num: int, dim: int):
     dim, step = dim + x.ndim if dim < 0 else dim, math.ceil(x.shape[dim] / num)
-    slice_params = [[slice(None)] * dim + [slice(k, k + step)] for k in range(0, x.shape[dim], step)]
-    return tuple(x[tuple(sl)] for sl in slice_params)
+    n = x.shape[dim]
+    return tuple(
+        x.slice(tuple(k if d == dim else 0 for d in range(x.ndim)), tuple(min_(k + step, n) if d == dim else s for d, s in enumerate(x.shape)))
+        for k in range(0, n, step)
+    )
 
 
 @procedure_set.register()
@@ -416,21 +442,35 @@ def unsqueeze(x, dim) -> Tensor:
     return x.reshape(x.shape[:dim] + (1,) + x.shape[dim:])
 
 
+@functools.lru_cache(maxsize=1024)
+def transpose_perm(ndim, ax, aw):
+    order = list(range(ndim))
+    order[ax], order[aw] = order[aw], order[ax]
+    return tuple(order)
+
+
 @procedure_set.register()
 def transpose(x, ax=1, aw=0):
-    order = list(range(len(x.shape)))
-    order[ax], order[aw] = order[aw], order[ax]
-    return x.permute(tuple(order))
+    perm = transpose_perm(x.ndim, ax, aw)
+    return x if perm == tuple(range(x.ndim)) else x.permute(perm)
 
 
 @procedure_set.register()
 def flatten(x, start_dim=0):
+    if x.ndim > 0 and start_dim in (-1, x.ndim - 1):
+        return x
     return x.reshape(shape=x.shape[:start_dim] + (-1,))
 
 
 @procedure_set.register()
 def cumsum(x, dim: int = 0):
-    return x.transpose(dim, -1).pad((x.shape[dim] - 1, 0)).pool((x.shape[dim],)).sum(-1).transpose(dim, -1)
+    # log2(n) shifted adds, each adds in the partial sum from k positions back
+    dim = dim + x.ndim if dim < 0 else dim
+    n, k = x.shape[dim], 1
+    while k < n:
+        x = x + x.padslice(tuple((-k, n - k) if d == dim else (0, s) for d, s in enumerate(x.shape)))
+        k *= 2
+    return x
 
 
 @staticmethod
@@ -443,7 +483,16 @@ def arange_with_cumsum(start, stop=None, step=1):
 
 @procedure_set.register()
 def one_hot(x, k, dtype=dtypes.int32):
-    return (x[:, None].cast(dtype) == slope.arange(k, dtype=dtype)).cast(dtype)
+    # one 1 is scattered per row, rather than comparing every row against an arange of k
+    # labels outside [0, k), negative ones included, give all-zero rows: they are clamped into the row
+    # so they cannot alias another one, and scatter a 0 instead of a 1
+    n = math.prod(x.shape)
+    rows = slope.arange(n, dtype=slope.backend.dtype_for_indices, device=x.device)
+    labels = x.reshape((n, 1)).cast(rows.dtype)
+    clamped = labels.maximum(slope.zeros_like(labels)).minimum(slope.full_like(labels, k - 1))
+    w = rows.reshape((n, 1)).cat(clamped, dim=1)
+    u = (clamped == labels).cast(dtype).reshape((n,))
+    return slope.full((n, k), 0, dtype=dtype, device=x.device).scatter_nd(w, u).reshape((*x.shape, k))
 
 
 @procedure_set.register()
@@ -500,7 +549,7 @@ def pool(
         return (x,) * cnt if isinstance(x, int) else x
 
     def flatten_seq(l):
-        return [item for sublist in l for item in sublist]
+        return list(itertools.chain.from_iterable(l))
 
     k_ = kernel_size
     assert len(x.shape) >= len(k_), f"can't pool {x.shape} with {k_}"
@@ -616,7 +665,7 @@ def conv(x, w, groups=1, stride=1, dilation=1, padding=0):
 @procedure_set.register()
 def conv_transpose(x, w, groups=1, stride=1, dilation=1, padding=0, output_padding=0):
     make_pair = lambda x, cnt=2: (x,) * cnt if isinstance(x, int) else x
-    flatten_seq = lambda l: [item for sublist in l for item in sublist]
+    flatten_seq = lambda l: list(itertools.chain.from_iterable(l))
     D, trailing = w.shape[2:], tuple(range(3, len(w.shape) + 1))
     w = w.reshape(((groups, w.shape[0] // groups, w.shape[1], *w.shape[2:])))  # (1, 64, 64, 3, 3)
     w = w.permute((0, 2, 1, *trailing))
@@ -711,9 +760,25 @@ def binary_cross_entropy_with_logits(x, y: Tensor) -> Tensor:
 
 @procedure_set.register()
 def cross_entropy(x, y) -> Tensor:
-    y_counter = slope.arange(x.shape[-1], dtype=slope.int32)[None, ..., None]
-    y_oh = (y_counter == y[..., None, None]).where(-1.0, 0.0).squeeze(-1)
-    return (x.log_softmax(-1) * y_oh).sum()
+    y_counter = _cached_arange(x.shape[-1], dtypes.int32, x.device)[None, ..., None]
+    y_oh = (y_counter == y[..., None, None]).squeeze(-1)
+    # sum of logsumexp(x) - x[y], without materializing log_softmax(x)
+    m = x.max(-1, keepdim=True).stop_gradient()
+    logsumexp_x = (x - m).exp().sum(-1).log() + m.squeeze(-1)
+    return (logsumexp_x - y_oh.where(x, 0.0).sum(-1)).sum()
+
+
+@procedure_set.register()
+def int_pow(x, n: int):
+    # square-and-multiply chain of muls: no pow kernel, and its jvp has no log(x) term
+    y = None
+    while n:
+        if n & 1:
+            y = x if y is None else y * x
+        n >>= 1
+        if n:
+            x = x * x
+    return y
 
 
 @procedure_set.register()
@@ -726,7 +791,8 @@ def softmax(x, dim=-1):
 
 @procedure_set.register()
 def log_softmax(x, dim=-1):
-    x = x - x.max(dim, keepdim=True)
+    # the shift cancels out of the result, so its gradient is not traced
+    x = x - x.max(dim, keepdim=True).stop_gradient()
     logsumexp_x = x.exp().sum(dim, keepdim=True).log()
     return x - logsumexp_x
 
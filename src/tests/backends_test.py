@@ -0,0 +1,142 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import slope
+import numpy as np
+
+
+class TestNumpyBackend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prev_backend = slope.core.backend
+        slope.core.set_backend("numpy")
+
+    @classmethod
+    def tearDownClass(cls):
+        slope.core.backend = cls.prev_backend
+
+    def assert_jit_matches_eager(self, f, *args):
+        np.testing.assert_allclose(slope.jit(f)(*args).numpy(), f(*args).numpy(), rtol=1e-5, atol=1e-6)
+
+    def assert_codegen(self, f, *args):
+        # jit matches eager, and the generated code is returned for checks on its shape
+        self.assert_jit_matches_eager(f, *args)
+        return slope.jit(f).lower(*args).code
+
+    def test_inlining(self):
+        x = slope.tensor(np.linspace(-2, 2, 12, dtype=np.float32).reshape(3, 4))
+        code = self.assert_codegen(lambda x: ((x * x + 1.0) / (x - 3.0)).exp() * x + x * x, x)
+        self.assertEqual(sum(1 for line in code.split("\n") if "x0" in line and "=" in line), 1)
+
+        def deep(x):  # deeper than max_inline_depth, so the chain is split into several statements
+            for _ in range(2 * slope.core.backend.max_inline_depth):
+                x = x * 0.5 + 1.0
+            return x
+
+        self.assert_codegen(deep, x)
+
+    @unittest.skipIf(importlib.util.find_spec("numexpr") is None, "numexpr is not installed")
+    def test_numexpr(self):
+        x = slope.tensor(np.linspace(-1, 1, 512 * 600, dtype=np.float32).reshape(512, 600))
+        code = self.assert_codegen(lambda x: (x * 2.0 + x).exp() * x, x)
+        self.assertIn("numexpr.evaluate", code)
+
+    def test_out_buffer_pool(self):
+        x = slope.tensor(np.linspace(-2, 2, 12, dtype=np.float32).reshape(3, 4))
+
+        def f(x):
+            a = x.exp()
+            b = a + a.sum(1, keepdim=True)
+            c = b * b.sum(0, keepdim=True)
+            return c - c.sum(1, keepdim=True)
+
+        self.assertIn("out=", self.assert_codegen(f, x))
+
+    def test_scalar_fill_folding(self):
+        x = slope.tensor(np.linspace(-2, 2, 12, dtype=np.float32).reshape(3, 4))
+        code = self.assert_codegen(lambda x: x * slope.full_like(x, 2.0) + slope.ones_like(x) * 3.0, x)
+        self.assertNotIn("broadcast_to", code)
+
+    def test_upcast_elision(self):
+        x = slope.tensor(np.linspace(-2, 2, 12, dtype=np.float32).reshape(3, 4))
+        for dtype in (slope.bool, slope.int8, slope.uint8, slope.float16):
+            with self.subTest(dtype=dtype):
+                m = slope.tensor(np.arange(12).reshape(3, 4) % 3, dtype=dtype)
+                code = self.assert_codegen(lambda x, m: x * m.cast(slope.float32) + m.cast(slope.float32).sum(), x, m)
+                self.assertNotIn("astype", code)
+
+    def test_pool_keeps_buffers_read_by_inlined_exprs(self):
+        # b = x / w stays inlined while c = 1 / w is emitted as w's last reader, w must not become c's out= buffer
+        def f(x):
+            w = x * x + 1.0
+            b = x / w
+            c = slope.ones_like(w) / w
+            return c * b + c
+
+        self.assert_jit_matches_eager(f, slope.tensor(np.linspace(-2, 2, 7, dtype=np.float32)))
+
+    def test_jit_grad_through_div(self):
+        grad_f = slope.grad(lambda x: (x / (x * x + 1.0)).sum())
+        self.assert_jit_matches_eager(grad_f, slope.tensor(np.linspace(-2, 2, 7, dtype=np.float32)))
+
+    def test_np_random_seed(self):
+        np.random.seed(12345)
+        x = slope.randn(3).numpy()
+        np.random.seed(12345)
+        np.testing.assert_array_equal(slope.randn(3).numpy(), x)
+        slope.core.backend.seed(12345)
+        np.testing.assert_array_equal(slope.randn(3).numpy(), x)
+
+
+
+class TestIREEBackend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prev_backend = slope.core.backend
+        slope.core.set_backend("iree")
+
+    @classmethod
+    def tearDownClass(cls):
+        slope.core.backend = cls.prev_backend
+
+    def test_eager_reshape(self):
+        x_np = np.arange(24, dtype=np.float32).reshape(2, 3, 4)
+        x = slope.tensor(x_np)
+        np.testing.assert_array_equal(x.reshape(4, 6).numpy(), x_np.reshape(4, 6))
+        np.testing.assert_array_equal(x.flatten().numpy(), x_np.flatten())
+        np.testing.assert_array_equal(x.expand_dims(1).squeeze(1).numpy(), x_np)
+        b = slope.tensor(np.array([True, False, True, True]), dtype=slope.bool).reshape(2, 2)
+        self.assertIs(b.dtype, slope.bool)
+        np.testing.assert_array_equal(b.numpy(), [[True, False], [True, True]])
+
+    def test_eager_reshape_without_buffer_view(self):
+        # the view impl gives up and the reshape runs as a compiled program
+        x_np = np.arange(6, dtype=np.float32)
+        x = slope.tensor(x_np)
+        with mock.patch("iree.runtime.HalBufferView", side_effect=TypeError):
+            y = x.reshape(2, 3)
+        np.testing.assert_array_equal(y.numpy(), x_np.reshape(2, 3))
+
+    def test_unwritable_cache_dir(self):
+        # the disk cache is skipped when cache_dir can't be created, the compiled program still runs
+        x_np = np.linspace(-1, 1, 7, dtype=np.float32)
+        with tempfile.NamedTemporaryFile() as f, mock.patch.object(type(slope.core.backend), "cache_dir", os.path.join(f.name, "iree")):
+            np.testing.assert_allclose(slope.jit(lambda x: x * 3.25 - 0.5)(slope.tensor(x_np)).numpy(), x_np * 3.25 - 0.5)
+
+    def test_cache_key_names_host_cpu(self):
+        # binaries tuned for the host are cached apart per cpu, and kept off the disk if the cpu is unknown
+        backend = slope.core.backend
+        code = slope.jit(lambda x: x * 2.0).lower(slope.tensor(np.ones(3, dtype=np.float32))).code
+        with tempfile.TemporaryDirectory() as d, mock.patch.object(type(backend), "cache_dir", d):
+            for cpu, num_files in (("cpu-a", 1), ("cpu-b", 2), ("cpu-a", 2), (None, 2)):
+                type(backend).compile_cached.cache_clear()
+                with mock.patch("slope.backends.iree.host_cpu", return_value=cpu):
+                    backend.compile_cached(code, "llvm-cpu", ("--iree-llvmcpu-target-cpu=host",))
+                self.assertEqual(len(os.listdir(d)), num_files)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
 import slope
+import slope.nn as nn
 from slope.core import Tensor
 import numpy as np
 from typing import NamedTuple
@@ -33,6 +34,29 @@ class TestNN(unittest.TestCase):
 
         res = self.run_ad_fns(f, slope.tensor([1, 0.5, -0.4, 0, -200]))
 
+    def test_fused_optimizers(self):
+        # fused optimizers update one flat buffer of all params, they must step exactly like the per-param ones
+        x = slope.tensor(np.linspace(-1, 1, 8, dtype=np.float32).reshape(4, 2))
+        model = nn.Sequential(nn.Linear(2, 3, bias=True), nn.Linear(3, 1))
+
+        @slope.jit
+        def train_step(model, optimizer):
+            loss, g_model = slope.value_and_grad(lambda model: (model(x) ** 2).sum())(model)
+            model, optimizer = optimizer(model, g_model)
+            return loss, model, optimizer
+
+        for optimizer_cls in (nn.GD, nn.SGD, nn.Adam):
+            params = []
+            for fused in (False, True):
+                m, optimizer = model, optimizer_cls(model, lr=0.1, fused=fused)
+                for _ in range(3):
+                    loss, m, optimizer = train_step(m, optimizer)
+                params += [[p.numpy() for p in slope.tree_flatten(m)[0]]]
+            with self.subTest(optimizer=optimizer_cls.__name__):
+                self.assertEqual(len(params[0]), 3)
+                for p, p_fused in zip(*params):
+                    np.testing.assert_allclose(p_fused, p, rtol=1e-5, atol=1e-6)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -25,6 +25,61 @@ class TestOperators(unittest.TestCase):
         slope.dblog(f"{args=}", enable=slope.core.backend.LOG_JIT)
         slope.dblog(f"{res=}", enable=slope.core.backend.LOG_JIT)
 
+    def check_op(self, f, f_np, x_np, grad=True):
+        # eager and jit values against the numpy reference, then eager and jit gradients of a weighted sum
+        # against a central finite difference of the reference in float64
+        x = slope.tensor(x_np)
+        expected = f_np(x_np)
+        np.testing.assert_allclose(f(x).numpy(), expected, rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(slope.jit(f)(x).numpy(), expected, rtol=1e-5, atol=1e-5)
+        if not grad:
+            return
+        weights_np = np.linspace(0.5, 1.5, expected.size).reshape(expected.shape)
+        weights = slope.tensor(weights_np.astype(np.float32))
+        grad_f = slope.grad(lambda x: (f(x) * weights).sum())
+        eps, x64, expected_grad = 1e-4, x_np.astype(np.float64), np.zeros(x_np.shape)
+        for i in np.ndindex(x_np.shape):
+            dx = np.zeros_like(x64)
+            dx[i] = eps
+            expected_grad[i] = ((f_np(x64 + dx) - f_np(x64 - dx)) * weights_np).sum() / (2 * eps)
+        np.testing.assert_allclose(grad_f(x).numpy(), expected_grad, rtol=1e-3, atol=1e-3)
+        np.testing.assert_allclose(slope.jit(grad_f)(x).numpy(), expected_grad, rtol=1e-3, atol=1e-3)
+
+    def test_unary(self):
+        x_np = np.array([[-2.0, -0.7, 0.3], [0.9, 1.6, 2.5]], dtype=np.float32)
+        self.check_op(lambda x: x.abs(), np.abs, x_np)
+        self.check_op(lambda x: x.sign(), np.sign, x_np)
+        self.check_op(lambda x: x.cos(), np.cos, x_np)
+        self.check_op(lambda x: x.abs().rsqrt(), lambda x: 1 / np.sqrt(np.abs(x)), x_np)
+
+    def test_softmax(self):
+        def softmax_np(x):
+            e = np.exp(x - x.max(-1, keepdims=True))
+            return e / e.sum(-1, keepdims=True)
+
+        x_np = np.array([[-2.0, -0.7, 0.3, 1.1], [0.9, 1.6, 2.5, -3.0]], dtype=np.float32)
+        self.check_op(lambda x: x.softmax(-1), softmax_np, x_np)
+        self.check_op(lambda x: x.softmax(0), lambda x: softmax_np(x.T).T, x_np)
+
+    def test_cumsum(self):
+        x_np = np.array([[-2.0, -0.7, 0.3, 1.1], [0.9, 1.6, 2.5, -3.0]], dtype=np.float32)
+        self.check_op(lambda x: x.cumsum(1), lambda x: np.cumsum(x, 1), x_np)
+        self.check_op(lambda x: x.cumsum(0), lambda x: np.cumsum(x, 0), x_np)
+
+    def test_tile(self):
+        x_np = np.array([[-2.0, -0.7, 0.3], [0.9, 1.6, 2.5]], dtype=np.float32)
+        self.check_op(lambda x: x.tile((2, 3)), lambda x: np.tile(x, (2, 3)), x_np)
+        self.check_op(lambda x: x.tile((2, 1, 2)), lambda x: np.tile(x, (2, 1, 2)), x_np)
+
+    def test_where(self):
+        x_np = np.array([[-2.0, -0.7, 0.3], [0.9, 1.6, 2.5]], dtype=np.float32)
+        self.check_op(lambda x: (x > 0).where(x * x, x * 3.0), lambda x: np.where(x > 0, x * x, x * 3), x_np)
+
+    def test_argmax(self):
+        x_np = np.array([[-2.0, 1.7, 0.3], [0.9, -1.6, 2.5]], dtype=np.float32)
+        self.check_op(lambda x: x.argmax(1), lambda x: np.argmax(x, 1), x_np, grad=False)
+        self.check_op(lambda x: x.argmax(0), lambda x: np.argmax(x, 0), x_np, grad=False)
+
     def test_maximum(self):
         def f(x, **kwargs):
             z = slope.zeros_like(x)
@@ -33,6 +88,23 @@ class TestOperators(unittest.TestCase):
 
         res = self.run_ad_fns(f, slope.tensor([1, 0.5, -0.4, 0, -200]))
 
+    def test_div_grad(self):
+        x_np = np.linspace(-2, 2, 7, dtype=np.float32)
+        grad_f = slope.grad(lambda x: (x / (x * x + 1.0)).sum())
+        expected = (1 - x_np**2) / (x_np**2 + 1) ** 2
+        x = slope.tensor(x_np)
+        np.testing.assert_allclose(grad_f(x).numpy(), expected, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(slope.jit(grad_f)(x).numpy(), expected, rtol=1e-5, atol=1e-6)
+
+    def test_one_hot(self):
+        # labels outside [0, k), negative ones included, give all-zero rows
+        x = slope.tensor([[0, 2, -1], [3, -4, 1]], dtype=slope.int32)
+        expected = np.array([[[1, 0, 0], [0, 0, 1], [0, 0, 0]], [[0, 0, 0], [0, 0, 0], [0, 1, 0]]])
+        np.testing.assert_array_equal(x.one_hot(3).numpy(), expected)
+        y = slope.jit(lambda x: x.one_hot(3, dtype=slope.float32))(x)
+        self.assertIs(y.dtype, slope.float32)
+        np.testing.assert_array_equal(y.numpy(), expected)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -33,6 +33,96 @@ class TestProcedures(unittest.TestCase):
 
         res = self.run_ad_fns(f, slope.tensor([1, 0.5, -0.4, 0, -200]))
 
+    def assert_fallback_matches_operator(self, name, tensors, *static_args):
+        # the procedure is what a backend without an impl of the operator runs, eagerly or traced into a program
+        fallback = getattr(slope.procedures, name)
+        expected = getattr(tensors[0], name)(*tensors[1:], *static_args).numpy()
+        np.testing.assert_allclose(fallback(*tensors, *static_args).numpy(), expected, rtol=1e-5, atol=1e-5)
+        jit_fallback = slope.jit(lambda *tensors: fallback(*tensors, *static_args))
+        np.testing.assert_allclose(jit_fallback(*tensors).numpy(), expected, rtol=1e-5, atol=1e-5)
+
+    def test_fallbacks(self):
+        x = slope.tensor(np.array([[-2.0, -0.7, 0.3, 1.1], [0.9, 1.6, 2.5, -3.0]], dtype=np.float32))
+        for name in ("abs", "cos", "relu"):
+            with self.subTest(name=name):
+                self.assert_fallback_matches_operator(name, (x,))
+        with self.subTest(name="rsqrt"):
+            self.assert_fallback_matches_operator("rsqrt", (x.abs(),))
+        for dim in (0, 1, -1):
+            with self.subTest(name="cumsum", dim=dim):
+                self.assert_fallback_matches_operator("cumsum", (x,), dim)
+            with self.subTest(name="softmax", dim=dim):
+                self.assert_fallback_matches_operator("softmax", (x,), dim)
+            with self.subTest(name="argmax", dim=dim):
+                self.assert_fallback_matches_operator("argmax", (x,), dim)
+        for repeats in ((2, 3), (3, 1, 2)):
+            with self.subTest(name="tile", repeats=repeats):
+                self.assert_fallback_matches_operator("tile", (x,), repeats)
+        with self.subTest(name="one_hot"):
+            self.assert_fallback_matches_operator("one_hot", (slope.tensor([[0, 2, -1], [3, -4, 1]], dtype=slope.int32),), 3)
+        for w in ([[1], [0]], [[1, 2], [0, 3], [1, 0]], [[[0, 1]], [[1, 3]]]):
+            with self.subTest(name="gather_nd", w=w):
+                self.assert_fallback_matches_operator("gather_nd", (x, slope.tensor(w, dtype=slope.int32)))
+
+    def test_flatten(self):
+        for x_np in (np.array(3.0, dtype=np.float32), np.arange(4, dtype=np.float32), np.arange(24, dtype=np.float32).reshape(2, 3, 4)):
+            for start_dim in range(-max(x_np.ndim, 1), max(x_np.ndim, 1)):
+                with self.subTest(shape=x_np.shape, start_dim=start_dim):
+                    y, y_np = slope.tensor(x_np).flatten(start_dim), x_np.reshape(x_np.shape[:start_dim] + (-1,))
+                    self.assertEqual(tuple(y.shape), y_np.shape)
+                    np.testing.assert_array_equal(y.numpy(), y_np)
+
+    def test_minimum_clip(self):
+        x_np = np.array([-3.0, -0.5, 0.0, 0.5, 3.0], dtype=np.float32)
+        x = slope.tensor(x_np)
+        np.testing.assert_array_equal(x.minimum(slope.zeros_like(x)).numpy(), np.minimum(x_np, 0))
+        np.testing.assert_array_equal(x.clip(-1.0, 1.0).numpy(), np.clip(x_np, -1, 1))
+
+    def test_getitem(self):
+        x_np = np.arange(3 * 4 * 5, dtype=np.float32).reshape(3, 4, 5)
+        x = slope.tensor(x_np)
+        idx_np = np.array([2, 0, 1])
+        idx = slope.tensor(idx_np, dtype=slope.int32)
+        basic_keys = [
+            1,
+            -1,
+            (0, 2),
+            slice(1, None),
+            (slice(None, None, 2), slice(None, None, -1)),
+            (slice(4, 0, -2), 1, slice(-3, None)),
+            (slice(3, 3),),
+            (Ellipsis, 1),
+            (None, 0, Ellipsis, None),
+            (slice(None), [1, 3]),
+            [0, 2],
+        ]
+        for key in basic_keys:
+            with self.subTest(key=key):
+                np.testing.assert_array_equal(x[key].numpy(), x_np[key])
+        # advanced indices, with a tensor index present ints count as advanced indices too
+        tensor_keys = [
+            (idx,),
+            (slice(None), idx),
+            (Ellipsis, idx),
+            (idx, idx),
+            (0, slice(None), idx),
+            (slice(None), 0, idx),
+            (idx, slice(None), 0),
+            (idx, 1, idx),
+            (None, idx, 0),
+            (0, None, idx),
+            (idx, slice(1, 3), idx),
+            (idx, idx, slice(0, 3, -2)),
+            (slice(2, -1), idx, idx),
+            (slice(3, 3), idx),
+        ]
+        for key in tensor_keys:
+            key_np = tuple(idx_np if k is idx else k for k in key)
+            with self.subTest(key=key_np):
+                y = x[key]
+                self.assertEqual(tuple(y.shape), x_np[key_np].shape)
+                np.testing.assert_array_equal(y.numpy(), x_np[key_np])
+
 
 if __name__ == "__main__":
     unittest.main()